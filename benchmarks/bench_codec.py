@@ -0,0 +1,54 @@
+"""
+Round trip of a synthetic address book through address_book.json with every available JSON decoder:
+save_to_json and load_from_json throughput in records per second.
+The encoder is the same for all of them (codec.write_book), the stdlib json.dump(indent=3) is shown for comparison.
+
+Usage: python benchmarks/bench_codec.py [count]
+"""
+import os
+import sys
+import json
+import tempfile
+from time import perf_counter
+
+from synthetic import make_records
+
+import codec  # foxbot is put on sys.path by synthetic
+from classAddressBook import AddressBook
+
+
+def timed(function):
+    start = perf_counter()
+    function()
+    return perf_counter() - start
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "book.json")
+
+    book = AddressBook(os.path.join(directory, "source.json"))
+    for record in make_records(count):
+        book.add_record(record)
+    book.changes.clear()
+
+    def stdlib_save():
+        with open(filename, "w", encoding="utf-8") as file:
+            json.dump(dict(book.record_dicts()), file, indent=3)
+
+    print(f"{count} records")
+    print(f"  save  json.dump(indent=3)  {count / timed(stdlib_save):>10,.0f} records/s")
+    print(f"  save  codec.write_book     {count / timed(lambda: book.save_to_json(filename)):>10,.0f} records/s")
+
+    for name in codec.available_backends():
+        codec.use_backend(name)
+        for lazy in (False, True):
+            target = AddressBook(os.path.join(directory, "target.json"), lazy=lazy)
+            seconds = timed(lambda: target.load_from_json(filename))
+            assert len(target) == count
+            print(f"  load  {name:<8} lazy={lazy!s:<5}  {count / seconds:>10,.0f} records/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Memory used by Record objects of a synthetic address book, compared with a baseline.
+
+The baseline is the record layout the book used before the records were slotted: every field is an object
+with a __dict__, phones are kept as strings and birthdays as datetime objects. Both kinds of records are
+built from the same JSON lines, the way a book is loaded, so the strings they hold are counted for both.
+
+Usage: python benchmarks/bench_memory.py [count]
+"""
+import sys
+import json
+import tracemalloc
+from datetime import datetime
+
+from synthetic import make_records
+
+from classAddressBook import Record
+
+
+class PlainField:
+    def __init__(self, value):
+        self._value = value
+
+
+class PlainBirthday:
+    def __init__(self, birthday):
+        self._birthday = datetime.strptime(birthday, "%d.%m.%Y")
+
+
+class PlainRecord:
+    def __init__(self, data):
+        self.name = PlainField(data["name"])
+        self.phones = [PlainField(phone) for phone in data["phones"]]
+        self.emails = [PlainField(email) for email in data["emails"]]
+        self.address = data["address"]
+        self.notes = data["notes"]
+        self.birthday = PlainBirthday(data["birthday"]) if data["birthday"] != "not set" else None
+
+
+# Returns the memory held by the records built from the JSON lines, in bytes
+def measure(lines, build):
+    tracemalloc.start()
+    records = [build(json.loads(line)) for line in lines]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records
+    return current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    lines = [json.dumps(record.to_dict()) for record in make_records(count)]
+
+    baseline = measure(lines, PlainRecord)
+    used = measure(lines, Record.from_dict)
+    for name, size in (("baseline (plain attributes)", baseline), ("Record (slots, int phones, ordinals)", used)):
+        print(f"{name:<38} {count} records: {size / 2 ** 20:7.1f} MiB, {size / count:5.0f} bytes per record")
+    print(f"Record uses {used / baseline:.0%} of the baseline memory ({baseline / used:.2f}x less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Throughput of sorter runs on a synthetic directory tree for different numbers of workers.
+
+All files of the tree have the same content, so with --dedup every file but the first one is a duplicate.
+
+Usage: python benchmarks/bench_sorter.py [--files 100000] [--workers 1 2 4 8] [--size 4096] [--dedup] [--dir PATH]
+"""
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "foxbot"))
+
+import sorter  # noqa: E402
+
+
+SUFFIXES = ["jpg", "png", "txt", "pdf", "mp3", "mp4", "docx", "py", "json", "bin"]
+
+
+# Creates a tree of count files spread over nested folders
+def make_tree(root, count, size, seed=42):
+    rng = random.Random(seed)
+    payload = rng.randbytes(size)
+    for i in range(count):
+        folder = root / f"dir{i % 100}" / f"sub{i % 7}"
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"file {i % 1000}_{i}.{rng.choice(SUFFIXES)}").write_bytes(payload)
+
+
+def run_once(root, workers, dedup=False):
+    shutil.rmtree(root / "Sorted", ignore_errors=True)
+    run = sorter.SortRun(root, workers=workers, dedup=dedup)
+    start = time.perf_counter()
+    run.run()
+    elapsed = time.perf_counter() - start
+    if run.error:
+        raise run.error
+    return run.files + run.duplicates, run.bytes, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=10_000)
+    parser.add_argument("--size", type=int, default=4096, help="size of every file in bytes")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--dedup", action="store_true", help="store identical files once")
+    parser.add_argument("--dir", type=Path, help="where to create the tree (default: a temporary folder)")
+    args = parser.parse_args()
+
+    base = Path(tempfile.mkdtemp(dir=args.dir))
+    try:
+        make_tree(base, args.files, args.size)
+        for workers in args.workers:
+            files, size, elapsed = run_once(base, workers, args.dedup)
+            print(f"workers={workers:<3} {files} files in {elapsed:.2f}s: "
+                  f"{files / elapsed:.0f} files/s, {size / elapsed / 2 ** 20:.1f} MiB/s")
+    finally:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
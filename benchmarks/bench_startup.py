@@ -0,0 +1,70 @@
+"""
+Cold start time of the application: the import time of foxbot/main.py measured with python -X importtime.
+The window is shown as soon as the imports are done, the address book is loaded in the background,
+so this is the time until the user sees the application.
+
+Most of it is tkinter, ttk and threading, which the application can not do without and whose import time
+depends on the machine far more than on the application. The budget applies to the rest: the median import time
+of main minus the median import time of those modules alone, measured in alternating runs.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--budget MS] [--top N]
+Exits with status 1 when the median exceeds the budget.
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+
+FOXBOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "foxbot")
+BUDGET_MS = 15
+# The modules every start of a Tk application imports
+FLOOR = "import threading, tkinter, tkinter.ttk"
+
+
+# Runs one interpreter executing the code, returns {module: (self_us, cumulative_us)}
+def import_times(code="import main"):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                            cwd=FOXBOT, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        times[module.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of the application")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget", type=float, default=BUDGET_MS, help=f"milliseconds over the tkinter import (default: {BUDGET_MS})")
+    parser.add_argument("--top", type=int, default=10, help="number of the slowest modules to show")
+    args = parser.parse_args()
+
+    runs = []
+    floor_runs = []
+    for _ in range(args.runs):
+        runs.append(import_times())
+        floor_runs.append(import_times(FLOOR))
+    total = statistics.median(times["main"][1] for times in runs) / 1000
+    floor = statistics.median(sum(cumulative_us for module, (_, cumulative_us) in times.items()
+                                  if module in ("threading", "tkinter", "tkinter.ttk"))
+                              for times in floor_runs) / 1000
+    own = total - floor
+
+    print("Slowest modules (cumulative, last run):")
+    last = runs[-1]
+    for module, (_, cumulative_us) in sorted(last.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {module}")
+    print(f"import main: {total:.1f} ms (median of {args.runs}), threading and tkinter alone: {floor:.1f} ms")
+    print(f"application: {own:.1f} ms, budget {args.budget:.0f} ms")
+
+    if own > args.budget:
+        print("Over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Benchmark suite of the address book and the sorter on synthetic data.
+
+Books of every --sizes are generated with synthetic.make_records (birthdays from generate_random_birthdate),
+trees of every --files with bench_sorter.make_tree. Measured:
+    save_to_json, load_from_json (eager and lazy), find_data_in_book (the first search builds the index),
+    filter_contacts_by_birthday and sorter.parse_folder.
+
+The results are written as JSON (by default to benchmarks/results/<commit>.json), --compare prints the change
+against an earlier result file and exits with status 1 if something got slower by more than --threshold.
+
+Usage: python benchmarks/run_suite.py [--sizes 1000 10000 100000 1000000] [--files 1000 10000 100000]
+                                      [--repeat 3] [--output FILE] [--compare FILE] [--threshold 0.1]
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+
+from synthetic import make_records
+from bench_sorter import make_tree
+
+import sorter  # foxbot is put on sys.path by synthetic
+from classAddressBook import AddressBook
+
+
+RESULTS = Path(__file__).resolve().parent / "results"
+SEARCHES = ["user-1", "kyiv", "@example", "0123", "Anna User-999"]
+
+
+# Runs function repeat times and returns the timings in seconds; setup runs before every call and is not timed
+def measure(function, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+    return timings
+
+
+def result(name, size, timings, unit):
+    best = min(timings)
+    return {
+        "name": name,
+        "size": size,
+        "min": best,
+        "median": statistics.median(timings),
+        "rate": size / best if best else None,
+        "unit": unit,
+    }
+
+
+def bench_book(directory, size, repeat):
+    results = []
+    filename = os.path.join(directory, f"book_{size}.json")
+
+    book = AddressBook(os.path.join(directory, f"source_{size}.json"))
+    for record in make_records(size):
+        book.add_record(record)
+    book.changes.clear()
+
+    results.append(result("save_to_json", size, measure(lambda: book.save_to_json(filename), repeat), "records/s"))
+
+    for lazy in (False, True):
+        books = []
+
+        def load():
+            target = AddressBook(os.path.join(directory, "target.json"), lazy=lazy)
+            target.load_from_json(filename)
+            books.append(target)
+
+        name = "load_from_json[lazy]" if lazy else "load_from_json"
+        results.append(result(name, size, measure(load, repeat, setup=books.clear), "records/s"))
+
+    loaded = AddressBook(os.path.join(directory, "target.json"))
+    loaded.load_from_json(filename)
+    results.append(result("find_data_in_book[first]", size,
+                          measure(lambda: loaded.find_data_in_book(SEARCHES[0]), 1), "records/s"))
+
+    def search():
+        for search_string in SEARCHES:
+            loaded.find_data_in_book(search_string)
+
+    results.append(result("find_data_in_book", size,
+                          measure(search, repeat, setup=loaded.search_cache.results.clear), "records/s"))
+
+    for days in (7, 30):
+        results.append(result(f"filter_contacts_by_birthday[{days}]", size,
+                              measure(lambda: loaded.filter_contacts_by_birthday(days), repeat), "records/s"))
+    return results
+
+
+def bench_sorter(directory, files, repeat):
+    root = Path(directory) / f"tree_{files}"
+    make_tree(root, files, size=1024)
+
+    def parse():
+        run = sorter.SortRun(root)
+        sorter.parse_folder(run, root)
+
+    timings = measure(parse, repeat, setup=lambda: shutil.rmtree(root / "Sorted", ignore_errors=True))
+    return [result("sorter.parse_folder", files, timings, "files/s")]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=Path(__file__).resolve().parent).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Prints the change of every benchmark against an earlier run, returns the names of the regressions
+def compare(results, baseline, threshold):
+    old = {(item["name"], item["size"]): item for item in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline.get('commit') or 'baseline'}:")
+    for item in results:
+        before = old.get((item["name"], item["size"]))
+        if before is None:
+            continue
+        change = item["min"] / before["min"] - 1
+        mark = ""
+        if change > threshold:
+            mark = "  SLOWER"
+            regressions.append(f"{item['name']} ({item['size']})")
+        print(f"  {item['name']:<34} {item['size']:>8}  {before['min']:9.4f}s -> {item['min']:9.4f}s  "
+              f"{change:+7.1%}{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the address book and the sorter")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[1_000, 10_000, 100_000], help="numbers of records")
+    parser.add_argument("--files", type=int, nargs="*", default=[1_000, 10_000], help="numbers of files")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=Path, help="an earlier result file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="slowdown reported as a regression")
+    parser.add_argument("--dir", help="where to create the data (default: a temporary folder)")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(dir=args.dir)
+    results = []
+    try:
+        for size in args.sizes:
+            results.extend(bench_book(directory, size, args.repeat))
+        for files in args.files:
+            results.extend(bench_sorter(directory, files, args.repeat))
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    for item in results:
+        print(f"{item['name']:<34} {item['size']:>8}  {item['min']:9.4f}s  {item['rate']:>12,.0f} {item['unit']}")
+
+    commit = git_commit()
+    output = args.output or RESULTS / f"{commit or datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump({
+            "commit": commit,
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }, file, indent=3)
+    print(f"\nResults: {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        if regressions:
+            print(f"\nSlower than the baseline: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Synthetic address book data for the benchmarks.
+"""
+import sys
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "foxbot"))
+
+from classAddressBook import Record, generate_random_birthdate  # noqa: E402
+
+
+FIRST_NAMES = ["John", "Anna", "Olena", "Taras", "Maria", "Ivan", "Sofia", "Petro", "Oksana", "Andrii"]
+CITIES = ["Kyiv", "Lviv", "Odesa", "Dnipro", "Kharkiv"]
+
+
+# Builds a reproducible random record number i.
+# Phones must be unique in a book: i is mapped to 10 scattered digits one to one (the multiplier is coprime to 10).
+def make_record(i, rng=random):
+    record = Record(f"{rng.choice(FIRST_NAMES)} User-{i}")
+    record.add_phone(f"{(i * 7_654_321 + 1_234_567) % 10 ** 10:010d}")
+    if i % 2 == 0:
+        record.add_email(f"user{i}@example.com")
+    if i % 3 == 0:
+        record.address = f"{rng.choice(CITIES)}, {rng.randint(1, 200)} Main street"
+    record.add_birthday(generate_random_birthdate("01.01.1950", "31.12.2005", "%d.%m.%Y"))
+    return record
+
+
+# Yields count reproducible random records
+def make_records(count, seed=42):
+    random.seed(seed)
+    for i in range(count):
+        yield make_record(i)
@@ -0,0 +1,110 @@
+import queue
+import threading
+
+
+class AutoSaver:
+    """
+    Saves the changes of an address book in the background, some time after the last change.
+
+    Every change of the book restarts a timer of the Tk widget, so a burst of changes is saved once,
+    when the book has been idle for delay milliseconds. The changes are collected on the Tk thread,
+    the only one that touches the records, and written by a background thread, so the event loop
+    never waits for the disk. Changes queued while a write is running are merged into one write.
+    A failed write is retried with the next one and reported through on_error(error), called on the Tk thread.
+
+    A queryable storage (SQLite) has the changes written already and only commits them; its connection
+    is used by the Tk thread, so the commit is made on the Tk thread as well, without the writer thread.
+    """
+    def __init__(self, widget, book, delay=1000, on_error=None):
+        self.widget = widget
+        self.book = book
+        self.delay = delay
+        self.on_error = on_error
+        self.job = None
+        self.error = None  # The last failed write, reported on the Tk thread
+        self.queue = queue.Queue()
+        self.thread = None
+        if not book.storage.queryable:
+            self.thread = threading.Thread(target=self.write_loop, name="autosave", daemon=True)
+            self.thread.start()
+        book.on_change = self.mark_dirty
+
+    # Called by the book after every change
+    def mark_dirty(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+        self.job = self.widget.after(self.delay, self.save)
+
+    # Hands the changes over to the writer thread
+    def save(self):
+        self.job = None
+        changes = self.book.take_changes()
+        if not changes:
+            return
+        if self.thread is None:
+            try:
+                self.book.storage.append(changes)
+            except Exception as error:
+                # The transaction stays open, the next commit saves these changes too
+                self.error = error
+            self.report_error()
+        else:
+            self.queue.put(changes)
+            self.widget.after(self.delay, self.report_error)
+
+    def report_error(self):
+        error = self.take_error()
+        if error is not None and self.on_error is not None:
+            self.on_error(error)
+
+    def write_loop(self):
+        pending = {}
+        while True:
+            batch = self.queue.get()
+            # Merge everything that is already queued, the latest state of a record wins
+            batches = [batch]
+            while True:
+                try:
+                    batches.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batches
+            for batch in batches:
+                if batch is not None:
+                    pending.update(batch)
+
+            if pending:
+                try:
+                    self.book.storage.append(pending.items())
+                except Exception as error:
+                    # Keep the changes, the next write tries them again
+                    self.error = error
+                else:
+                    pending = {}
+            if stop:
+                return
+
+    # Returns and clears the error of a failed write, None if the writes succeeded
+    def take_error(self):
+        error, self.error = self.error, None
+        return error
+
+    # Saves everything pending and stops the writer thread; raises the error of a failed write
+    def close(self):
+        if self.job is not None:
+            self.widget.after_cancel(self.job)
+        self.book.on_change = None
+        changes = self.book.take_changes()
+        if self.thread is None:
+            # Commits a transaction left open by a failed commit as well
+            self.error = None
+            self.book.storage.append(changes)
+            return
+        if changes:
+            self.queue.put(changes)
+        self.queue.put(None)
+        self.thread.join()
+        error = self.take_error()
+        if error is not None:
+            raise error
@@ -0,0 +1,164 @@
+import io
+import sys
+import csv
+import json
+import gzip
+import argparse
+from contextlib import ExitStack
+
+from classAddressBook import AddressBook
+
+
+FORMATS = ('json', 'jsonl', 'csv', 'vcard')
+SUFFIXES = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv', '.vcf': 'vcard', '.vcard': 'vcard'}
+COMPRESSIONS = ('gzip', 'zstd')
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+CSV_COLUMNS = ('name', 'phones', 'emails', 'address', 'birthday', 'notes')
+
+
+# Placeholders of the JSON format for missing values are left out of CSV and vCard
+def plain(value):
+    return "" if value in (None, "not set") else value
+
+
+# Compact JSON in the layout of address_book.json: {"name": {record}, ...}
+def write_json(records, write):
+    write("{")
+    separator = ""
+    for name, data in records:
+        write(f"{separator}{json.dumps(name)}:{json.dumps(data, separators=(',', ':'))}")
+        separator = ","
+    write("}\n")
+
+
+def write_jsonl(records, write):
+    for _, data in records:
+        write(json.dumps(data, separators=(',', ':')) + "\n")
+
+
+# CSV with a header, several phones or emails are separated by ";" (the format read by bulk_import)
+def write_csv(records, write):
+    class Writer:
+        def write(self, line):
+            write(line)
+
+    writer = csv.writer(Writer())
+    writer.writerow(CSV_COLUMNS)
+    for _, data in records:
+        writer.writerow((data["name"], ";".join(data["phones"]), ";".join(data["emails"]),
+                         plain(data.get("address")), plain(data.get("birthday")), plain(data.get("notes"))))
+
+
+def escape_vcard(value):
+    return value.replace("\\", "\\\\").replace(",", "\\,").replace(";", "\\;").replace("\n", "\\n")
+
+
+# vCard 3.0; the birthday is written as YYYY-MM-DD, the address goes to the street part of ADR
+def write_vcard(records, write):
+    for _, data in records:
+        name = escape_vcard(data["name"])
+        lines = ["BEGIN:VCARD", "VERSION:3.0", f"FN:{name}", f"N:{name};;;;"]
+        lines.extend(f"TEL:{phone}" for phone in data["phones"])
+        lines.extend(f"EMAIL:{escape_vcard(email)}" for email in data["emails"])
+        address = plain(data.get("address"))
+        if address:
+            lines.append(f"ADR:;;{escape_vcard(address)};;;;")
+        birthday = plain(data.get("birthday"))
+        if birthday:
+            day, month, year = birthday.split(".")
+            lines.append(f"BDAY:{year}-{month}-{day}")
+        notes = plain(data.get("notes"))
+        if notes:
+            lines.append(f"NOTE:{escape_vcard(notes)}")
+        lines.append("END:VCARD")
+        write("\r\n".join(lines) + "\r\n")
+
+
+WRITERS = {'json': write_json, 'jsonl': write_jsonl, 'csv': write_csv, 'vcard': write_vcard}
+
+
+def export_contacts(book, file, file_format, chunk_size=10000):
+    """
+    Writes all records of the book to a text file in the given format.
+    Records are read from the book one by one (a lazy or SQLite book does not build them at all)
+    and written in chunks of chunk_size records, so the serialized book is never held in memory as a whole.
+    Returns the number of exported records.
+    """
+    buffer = []
+    count = 0
+
+    def records():
+        nonlocal count
+        for name, data in book.record_dicts():
+            yield name, data
+            count += 1
+            if count % chunk_size == 0:
+                file.write("".join(buffer))
+                buffer.clear()
+
+    WRITERS[file_format](records(), buffer.append)
+    file.write("".join(buffer))
+    return count
+
+
+# Opens the output as a text file: a file or stdout ('-'), compressed with gzip or zstd if asked.
+# zstd needs the zstandard package.
+def open_output(stack, filename, compression=None):
+    if filename == '-':
+        binary = sys.stdout.buffer
+    else:
+        binary = stack.enter_context(open(filename, "wb"))
+
+    if compression == 'gzip':
+        binary = stack.enter_context(gzip.GzipFile(fileobj=binary, mode="wb"))
+    elif compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise SystemExit("zstd compression needs the zstandard package: pip install zstandard")
+        binary = stack.enter_context(zstandard.ZstdCompressor().stream_writer(binary, closefd=False))
+
+    text = io.TextIOWrapper(binary, encoding="utf-8", newline="")
+    stack.callback(text.detach)  # The binary streams are closed by the stack, stdout stays open
+    stack.callback(text.flush)
+    return text
+
+
+# Returns the format and the compression of an output file by its suffixes, e.g. contacts.jsonl.gz
+def detect_format(filename):
+    name = filename.lower()
+    compression = None
+    for suffix, value in COMPRESSION_SUFFIXES.items():
+        if name.endswith(suffix):
+            compression = value
+            name = name[:-len(suffix)]
+    for suffix, file_format in SUFFIXES.items():
+        if name.endswith(suffix):
+            return file_format, compression
+    return None, compression
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the address book")
+    parser.add_argument("file", help="output file, '-' for stdout")
+    parser.add_argument("--format", choices=FORMATS, help="output format (default: by the file suffix)")
+    parser.add_argument("--compress", choices=COMPRESSIONS, help="compression (default: by the file suffix)")
+    parser.add_argument("--book", default="address_book.json", help="address book file (default: address_book.json)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    file_format, compression = detect_format(args.file)
+    file_format = args.format or file_format
+    compression = args.compress or compression
+    if file_format is None:
+        parser.error(f"can not detect the format of {args.file}, use --format")
+
+    book = AddressBook(args.book, lazy=True)
+    with ExitStack() as stack:
+        count = export_contacts(book, open_output(stack, args.file, compression), file_format, args.chunk_size)
+    book.close()
+    print(f"Exported: {count}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
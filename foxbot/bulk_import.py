@@ -0,0 +1,284 @@
+import re
+import sys
+import csv
+import json
+import argparse
+from itertools import islice
+
+from classAddressBook import AddressBook, Record, Phone, Email, Birthday
+
+
+FORMATS = ('csv', 'vcard', 'jsonl')
+SUFFIXES = {'.csv': 'csv', '.vcf': 'vcard', '.vcard': 'vcard', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+# A whole batch of values joined with newlines is checked by one match; only a failed batch is checked value by value
+PHONES = re.compile(r'[0-9]{10}(?:\n[0-9]{10})*')
+EMAILS = re.compile(r'[^\n]*@[^@\n]*\.[^@\n]*(?:\n[^\n]*@[^@\n]*\.[^@\n]*)*')
+# Visual separators of phone numbers in CSV and vCard exports: "(050) 123-45-67"
+PHONE_SEPARATORS = re.compile(r'[\s\-().]')
+
+
+class ImportReport:
+    """
+    Result of a bulk import: the number of imported records and the rejected rows as (row number, reason) pairs.
+    """
+    def __init__(self):
+        self.imported = 0
+        self.rejected = []
+
+    def __str__(self):
+        return f"Imported: {self.imported}, rejected: {len(self.rejected)}"
+
+
+# Returns the values that do not pass check, checking the whole batch at once when all of them are valid
+def invalid_values(values, batch_pattern, check):
+    if not values:
+        return set()
+    text = "\n".join(values)
+    # A value with a newline of its own would shift the lines, such a batch is checked value by value
+    if text.count("\n") == len(values) - 1 and batch_pattern.fullmatch(text):
+        return set()
+    return {value for value in values if not check(value)}
+
+
+# Normalizes a row of any format: {"name", "phones", "emails", "address", "birthday", "notes"}
+def make_row(name, phones=(), emails=(), address=None, birthday=None, notes=None):
+    return {
+        "name": (name or "").strip(),
+        "phones": [phone for phone in phones if phone],
+        "emails": [email.strip() for email in emails if email and email.strip()],
+        "address": address or None,
+        "birthday": birthday if birthday and birthday != "not set" else None,
+        "notes": notes or None,
+    }
+
+
+def split_phones(value):
+    return [PHONE_SEPARATORS.sub('', phone) for phone in value.split(';')]
+
+
+# Yields (row number, row) pairs of a CSV file with a header.
+# Columns: name, phones (or phone), emails (or email), address, birthday, notes; several values are separated by ";"
+def read_csv(file):
+    reader = csv.DictReader(file)
+    for data in reader:
+        data = {(key or '').strip().lower(): value or '' for key, value in data.items()}
+        yield reader.line_num, make_row(
+            data.get('name'),
+            split_phones(data.get('phones') or data.get('phone', '')),
+            (data.get('emails') or data.get('email', '')).split(';'),
+            data.get('address'),
+            data.get('birthday'),
+            data.get('notes'),
+        )
+
+
+# Raises TypeError unless the decoded JSON line is a record of the address_book.json format:
+# every value is a string, phones and emails may also be lists of strings
+def check_jsonl_types(data):
+    if not isinstance(data, dict):
+        raise TypeError(f"expected an object, got {type(data).__name__}")
+    for key, value in data.items():
+        if key in ('phones', 'emails') and isinstance(value, list):
+            if not all(isinstance(item, str) for item in value):
+                raise TypeError(f"{key} must be strings")
+        elif not isinstance(value, str):
+            raise TypeError(f"{key} must be a string, got {type(value).__name__}")
+
+
+# Yields (row number, row) pairs of a file with one JSON record per line, in the format of address_book.json
+def read_jsonl(file):
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+            check_jsonl_types(data)
+        except (ValueError, TypeError) as error:
+            yield number, error
+            continue
+        phones = data.get('phones', [])
+        emails = data.get('emails', [])
+        yield number, make_row(
+            data.get('name'),
+            [phones] if isinstance(phones, str) else phones,
+            [emails] if isinstance(emails, str) else emails,
+            data.get('address') if data.get('address') != "not set" else None,
+            data.get('birthday'),
+            data.get('notes'),
+        )
+
+
+def unescape_vcard(value):
+    return re.sub(r'\\([\\,;nN])', lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+
+# vCard dates are YYYY-MM-DD or YYYYMMDD, the book uses the format of Birthday
+def vcard_date(value):
+    digits = value.replace('-', '')
+    if len(digits) == 8 and digits.isdigit():
+        return f"{digits[6:8]}.{digits[4:6]}.{digits[0:4]}"
+    return value
+
+
+# Yields (row number, row) pairs of a vCard file; the row number is the line of BEGIN:VCARD
+def read_vcard(file):
+    card = None
+    start = 0
+
+    # Unfold the lines: a line starting with a space or a tab continues the previous one
+    def logical_lines():
+        previous = None
+        for number, line in enumerate(file, 1):
+            line = line.rstrip('\r\n')
+            if line[:1] in (' ', '\t') and previous is not None:
+                previous = (previous[0], previous[1] + line[1:])
+                continue
+            if previous is not None:
+                yield previous
+            previous = (number, line)
+        if previous is not None:
+            yield previous
+
+    for number, line in logical_lines():
+        prop, _, value = line.partition(':')
+        prop = prop.split(';')[0].split('.')[-1].upper()  # Drop parameters and group names
+        if prop == 'BEGIN' and value.upper() == 'VCARD':
+            card = {'FN': '', 'N': '', 'TEL': [], 'EMAIL': [], 'ADR': '', 'BDAY': '', 'NOTE': ''}
+            start = number
+        elif prop == 'END' and card is not None:
+            name = card['FN'] or ' '.join(part for part in reversed(card['N'].split(';')) if part)
+            yield start, make_row(name, card['TEL'], card['EMAIL'], card['ADR'], vcard_date(card['BDAY']), card['NOTE'])
+            card = None
+        elif card is not None and prop in card:
+            if prop == 'TEL':
+                card['TEL'].append(PHONE_SEPARATORS.sub('', value.removeprefix('tel:')))
+            elif prop == 'EMAIL':
+                card['EMAIL'].append(unescape_vcard(value))
+            elif prop == 'ADR':
+                # PO box; extended; street; city; region; postal code; country
+                card['ADR'] = ', '.join(unescape_vcard(part) for part in re.split(r'(?<!\\);', value) if part)
+            elif prop == 'N':
+                card['N'] = value
+            else:
+                card[prop] = unescape_vcard(value)
+
+
+READERS = {'csv': read_csv, 'vcard': read_vcard, 'jsonl': read_jsonl}
+
+
+# Builds the records of a chunk of rows.
+# Returns the records as (row number, record) pairs and the rejected rows as (row number, reason) pairs.
+def build_records(rows):
+    records = []
+    rejected = []
+
+    valid_rows = []
+    for number, row in rows:
+        if isinstance(row, Exception):
+            rejected.append((number, f"Invalid row: {row}"))
+        elif not row["name"]:
+            rejected.append((number, "Name is missing"))
+        else:
+            valid_rows.append((number, row))
+
+    invalid_phones = invalid_values([phone for _, row in valid_rows for phone in row["phones"]],
+                                    PHONES, Phone.check_number)
+    invalid_emails = invalid_values([email for _, row in valid_rows for email in row["emails"]],
+                                    EMAILS, Email.check_email)
+
+    for number, row in valid_rows:
+        bad_phones = [phone for phone in row["phones"] if phone in invalid_phones] if invalid_phones else None
+        if bad_phones:
+            rejected.append((number, f"Invalid phone: {', '.join(bad_phones)}"))
+            continue
+        bad_emails = [email for email in row["emails"] if email in invalid_emails] if invalid_emails else None
+        if bad_emails:
+            rejected.append((number, f"Invalid email: {', '.join(bad_emails)}"))
+            continue
+
+        record = Record(row["name"])
+        if row["birthday"]:
+            try:
+                record.birthday = Birthday(row["birthday"])
+            except ValueError:
+                rejected.append((number, f"Invalid birthday: {row['birthday']}"))
+                continue
+        record.phones = [Phone.checked(phone) for phone in row["phones"]]
+        record.emails = [Email.checked(email) for email in row["emails"]]
+        if row["address"]:
+            record.address = sys.intern(row["address"])
+        if row["notes"]:
+            record.notes = row["notes"]
+        records.append((number, record))
+
+    return records, rejected
+
+
+def import_contacts(book, rows, chunk_size=10000):
+    """
+    Adds the contacts of the (row number, row) pairs of a reader to the book.
+    Rows are validated and added chunk by chunk, so the input is never held in memory as a whole;
+    the book is saved once, after the last chunk. A record with an existing name replaces it,
+    a row with a phone or an email of another contact is rejected.
+    Returns an ImportReport.
+    """
+    report = ImportReport()
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+        records, rejected = build_records(chunk)
+        for number, record in records:
+            try:
+                book.add_record(record)
+            except ValueError as error:  # A phone or an email of another contact
+                rejected.append((number, str(error)))
+            else:
+                report.imported += 1
+        report.rejected.extend(sorted(rejected))
+
+    book.save()
+    return report
+
+
+def detect_format(filename):
+    for suffix, file_format in SUFFIXES.items():
+        if filename.lower().endswith(suffix):
+            return file_format
+    raise ValueError(f"Can not detect the format of {filename}, use --format")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import contacts into the address book")
+    parser.add_argument("file", help="CSV, vCard or JSONL file, '-' for stdin")
+    parser.add_argument("--format", choices=FORMATS, help="format of the file (default: by the file suffix)")
+    parser.add_argument("--book", default="address_book.json", help="address book file (default: address_book.json)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--rejects", help="write the rejected rows to this CSV file instead of stderr")
+    args = parser.parse_args()
+
+    file_format = args.format or detect_format(args.file)
+    book = AddressBook(args.book, lazy=True)
+    # A failed import leaves the book as it was: nothing is saved before the end
+    if args.file == '-':
+        report = import_contacts(book, READERS[file_format](sys.stdin), args.chunk_size)
+    else:
+        with open(args.file, "r", encoding="utf-8-sig", newline="") as file:
+            report = import_contacts(book, READERS[file_format](file), args.chunk_size)
+    book.close()
+
+    if args.rejects:
+        with open(args.rejects, "w", encoding="utf-8", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["row", "reason"])
+            writer.writerows(report.rejected)
+    else:
+        for number, reason in report.rejected:
+            print(f"Row {number}: {reason}", file=sys.stderr)
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
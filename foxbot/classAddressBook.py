@@ -1,18 +1,32 @@
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from collections import UserDict
+from collections.abc import ItemsView, ValuesView
 
-import random
-import json
+import sys
+
+from storage import open_storage, atomic_write_book, iter_book
+from indexes import NGramIndex, BirthdayIndex, ContactIndex, SearchCache, next_birthday
 
 
 class Field:
     """
     Base class for record fields.
     Will be the parent for all fields.
+    Fields use __slots__ instead of a per-instance __dict__ to keep large books compact in memory.
     """
+    __slots__ = ('_value',)
+
     def __init__(self, value):
         self.value = value
 
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, new_value):
+        self._value = new_value
+
     def __str__(self):
         return str(self.value)
 
@@ -22,17 +36,18 @@ class Name(Field):
     Class for storing the contact name.
     A mandatory field.
     """
+    __slots__ = ()
+
     def __init__(self, name):
-        self._name = None
         self.name = name
 
     @property
     def name(self):
-        return self._name
+        return self._value
 
     @name.setter
     def name(self, new_name):
-        self._name = new_name
+        self._value = new_name
 
 
 class Phone(Field):
@@ -40,19 +55,24 @@ class Phone(Field):
     Class for storing a phone number.
     Has format validation (10 digits).
     An optional field for phone numbers. One Record can contain multiple phone numbers.
+    The number is stored as an integer and formatted back to 10 digits on access.
     """
+    __slots__ = ()
+
     def __init__(self, value):
-        self._value = None
         self.value = value
 
     @property
     def value(self):
+        if isinstance(self._value, int):
+            return f"{self._value:010d}"
         return self._value
 
     @value.setter
     def value(self, new_phone):
         if self.check_number(new_phone):
-            self._value = new_phone
+            # Non-ASCII digits are kept as they are, int() would change them
+            self._value = int(new_phone) if new_phone.isascii() else new_phone
         else:
             raise ValueError("Invalid phone: phone should consist of 10 digits only")
 
@@ -60,6 +80,13 @@ class Phone(Field):
     def check_number(phone_number):
         return len(phone_number) == 10 and phone_number.isdigit()
 
+    # Builds a phone from a number that was already checked (e.g. by a batch check of an import)
+    @classmethod
+    def checked(cls, phone_number):
+        phone = cls.__new__(cls)
+        phone._value = int(phone_number) if phone_number.isascii() else phone_number
+        return phone
+
 
 class Email(Field):
     """
@@ -67,8 +94,9 @@ class Email(Field):
     Has format validation for email.
     An optional field.
     """
+    __slots__ = ()
+
     def __init__(self, value):
-        self._value = None
         self.value = value
 
     @property
@@ -87,6 +115,13 @@ class Email(Field):
         # Simple check for the email format (more complex checks can be used as needed).
         return "@" in email and "." in email.split("@")[-1]
 
+    # Builds an email from an address that was already checked (e.g. by a batch check of an import)
+    @classmethod
+    def checked(cls, email):
+        instance = cls.__new__(cls)
+        instance._value = email
+        return instance
+
     def __str__(self):
         return str(self.value)
 
@@ -94,26 +129,42 @@ class Email(Field):
 class Birthday(Field):
     """
     Class representing the "Birthday" field.
+    The date is stored as a proleptic Gregorian ordinal.
     """
+    __slots__ = ()
+
     def __init__(self, birthday):
-        self._birthday = None
         self.birthday = birthday
-        
+
     form = '%d.%m.%Y'
 
     @property
     def birthday(self):
-        return self._birthday
+        return datetime.fromordinal(self._value)
 
     @birthday.setter
     def birthday(self, new_bd):
-        self._birthday = datetime.strptime(new_bd, self.form)
+        self._value = self.parse(new_bd).toordinal()
+
+    # Parses a date in the format of the field. The default "dd.mm.yyyy" format is parsed without strptime.
+    @classmethod
+    def parse(cls, text):
+        if cls.form == '%d.%m.%Y':
+            parts = text.split('.')
+            if (len(parts) == 3 and len(parts[0]) in (1, 2) and len(parts[1]) in (1, 2) and len(parts[2]) == 4
+                    and text.isascii() and ''.join(parts).isdigit()):
+                try:
+                    return date(int(parts[2]), int(parts[1]), int(parts[0]))
+                except ValueError:
+                    pass
+        return datetime.strptime(text, cls.form).date()
 
     def __str__(self):
-        if self._birthday:
-            return self._birthday.strftime(self.form)
-        else:
-            return "Birthday not set!"
+        if self.form == '%d.%m.%Y':
+            bd = date.fromordinal(self._value)
+            if bd.year >= 1000:
+                return f"{bd.day:02d}.{bd.month:02d}.{bd.year}"
+        return self.birthday.strftime(self.form)
 
 
 class Record:
@@ -122,27 +173,64 @@ class Record:
     Also contains a list of email addresses and an address.
     Responsible for the logic of adding/removing/editing optional fields and storing the mandatory Name field.
     """
+    __slots__ = ('book', 'name', 'phones', 'emails', '_address', '_notes', 'birthday', '__weakref__')
+
     def __init__(self, name, birthday=None):
+        self.book = None
         self.name = Name(name)
         self.phones = []
         self.emails = []
-        self.address = None
-        self.notes = None
+        self._address = None
+        self._notes = None
         self.birthday = Birthday(birthday) if birthday else birthday
 
+    # Lets the address book know that the record has to be saved again
+    def changed(self):
+        if self.book is not None:
+            self.book.record_changed(self)
+
+    @property
+    def address(self):
+        return self._address
+
+    @address.setter
+    def address(self, new_address):
+        self._address = new_address
+        self.changed()
+
+    @property
+    def notes(self):
+        return self._notes
+
+    @notes.setter
+    def notes(self, new_notes):
+        self._notes = new_notes
+        self.changed()
+
+    # Raises ValueError if a phone or an email belongs to another record of the book
+    def check_unique(self, phones=(), emails=()):
+        if self.book is not None:
+            self.book.check_unique(self, phones, emails)
+
     # Adding phone numbers
     def add_phone(self, phone_number):
-        phone = phone_number
-        self.phones.append(Phone(phone))
+        phone = Phone(phone_number)
+        self.check_unique(phones=[phone.value])
+        self.phones.append(phone)
+        self.changed()
 
     # Adding email addresses
     def add_email(self, email):
-        self.emails.append(Email(email))
-        return self.emails[-1]
+        email = Email(email)
+        self.check_unique(emails=[email.value])
+        self.emails.append(email)
+        self.changed()
+        return email
 
     # Adding birthday
     def add_birthday(self, bd):
         self.birthday = Birthday(bd)
+        self.changed()
         return self.birthday
 
     # Returns the number of days until the next birthday
@@ -150,13 +238,9 @@ class Record:
         if not self.birthday:
             return "Birthday not set"
 
-        now = datetime.now()
+        today = date.today()
         bd = self.birthday.birthday
-        certain_year = now.year
-        bd = bd.replace(year=certain_year)
-        if bd < now:
-            bd = bd.replace(year=certain_year + 1)
-        days_to_bdd = (bd.date() - now.date()).days
+        days_to_bdd = (next_birthday(bd.month, bd.day, today) - today).days
 
         return f"{days_to_bdd} days before the birthday"
 
@@ -165,6 +249,7 @@ class Record:
         for el in self.phones:
             if el.value == phone:
                 self.phones.remove(el)
+                self.changed()
                 return f"Phone {phone} has been deleted"
         return f"Phone {phone} is not found"
 
@@ -172,7 +257,10 @@ class Record:
     def edit_phone(self, old_phone, new_phone):
         for ind, phone in enumerate(self.phones):
             if phone.value == old_phone:
-                self.phones[ind] = Phone(new_phone)
+                new_phone = Phone(new_phone)
+                self.check_unique(phones=[new_phone.value])
+                self.phones[ind] = new_phone
+                self.changed()
                 return f"Phone number has been updated for {self.name.name}"
         raise ValueError
 
@@ -181,6 +269,7 @@ class Record:
         for el in self.emails:
             if el.value == email:
                 self.emails.remove(el)
+                self.changed()
                 return f"Email {email} has been deleted"
         return f"Email {email} is not found"
 
@@ -188,7 +277,10 @@ class Record:
     def edit_email(self, old_email, new_email):
         for ind, email in enumerate(self.emails):
             if email.value == old_email:
-                self.emails[ind] = Email(new_email)
+                new_email = Email(new_email)
+                self.check_unique(emails=[new_email.value])
+                self.emails[ind] = new_email
+                self.changed()
                 return f"Email address has been updated for {self.name.name}"
         raise ValueError
 
@@ -210,6 +302,29 @@ class Record:
             "notes": str(self.notes) if self.notes else "",
         }
 
+    # Builds a record from its dictionary representation (the reverse of to_dict)
+    @classmethod
+    def from_dict(cls, data):
+        record = cls(data["name"])
+
+        for phone_number in data["phones"]:
+            record.add_phone(phone_number)
+
+        for email_address in data["emails"]:
+            record.add_email(email_address)
+
+        if "address" in data:
+            # Placeholders like "not set" repeat in most records, keep a single copy of them
+            record.address = sys.intern(data["address"])
+
+        if data["birthday"] != "not set":
+            record.add_birthday(data["birthday"])
+
+        if "notes" in data:
+            record.notes = data["notes"]
+
+        return record
+
     def __str__(self):
         phone_numbers = ', '.join(str(phone) for phone in self.phones)
         email_addresses = ', '.join(str(email) for email in self.emails)
@@ -222,11 +337,13 @@ class Record:
 
 class AddressBookIterator:
     """
-    Generator for records in AddressBook, returning representations for N records in one iteration
+    Generator for records in AddressBook, returning representations for N records in one iteration.
+    Iterates over all records of the book, or over the given keys (e.g. the names found by a search).
+    Any page can also be fetched directly with get_page.
     """
-    def __init__(self, address_book, per_page=10):
+    def __init__(self, address_book, per_page=10, keys=None):
         self.address_book = address_book
-        self.keys = list(address_book.data.keys())
+        self.keys = list(address_book.data.keys() if keys is None else keys)
         self.per_page = per_page
         self.current_page = 0
 
@@ -234,122 +351,326 @@ class AddressBookIterator:
         return self
 
     def __next__(self):
-        start_idx = self.current_page * self.per_page
-        end_idx = (self.current_page + 1) * self.per_page
-
-        if start_idx >= len(self.keys):
+        if self.current_page * self.per_page >= len(self.keys):
             raise StopIteration
 
-        page_keys = self.keys[start_idx:end_idx]
-        page_records = [self.address_book.data[key] for key in page_keys]
+        page_records = self.get_page(self.current_page)
 
         self.current_page += 1
 
         return page_records
 
+    # Returns the records of the page; a record deleted after the keys were taken is returned as None
+    def get_page(self, page):
+        start_idx = page * self.per_page
+        end_idx = (page + 1) * self.per_page
+
+        page_keys = self.keys[start_idx:end_idx]
+        return [self.address_book.data.get(key) for key in page_keys]
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class LazyRecords(dict):
+    """
+    Dictionary of records that keeps every record in its raw dictionary form until it is accessed for the first time.
+    Used as AddressBook.data in lazy mode, so that loading a book does not build and validate all records upfront.
+    """
+    def __init__(self, materialize):
+        super().__init__()
+        self.materialize = materialize
+
+    def __getitem__(self, name):
+        value = super().__getitem__(name)
+        if not isinstance(value, Record):
+            value = self.materialize(value)
+            super().__setitem__(name, value)
+        return value
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def pop(self, name, *default):
+        if name not in self:
+            return super().pop(name, *default)
+        value = self[name]
+        super().pop(name)
+        return value
+
+    def values(self):
+        return ValuesView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    # Yields (name, record dictionary) pairs without building records that were not accessed yet
+    def record_dicts(self):
+        for name, value in super().items():
+            yield name, value.to_dict() if isinstance(value, Record) else value
+
 
 class AddressBook(UserDict):
     """
     Class for storing and managing records.
-    Inherits from UserDict and contains logic for searching records within this class
+    Inherits from UserDict and contains logic for searching records within this class.
+    Changes are persisted through a storage backend (see open_storage):
+    only the records changed since the last save are written.
+    Substring search, birthday queries and phone/email lookups go through indexes that are built on the first query
+    and kept up to date on every change after that. A phone or an email can belong to one record of the book only.
+    In lazy mode records are built from their raw form only when accessed through find or data.
+    A book in a SQLite database (a .db file, see open_storage) is not loaded at all: data reads the records
+    from the database on access and the queries run in SQL.
     """
-    def __init__(self):
+    def __init__(self, filename="address_book.json", lazy=False):
         super().__init__()
-        self.load_from_json("address_book.json")
-
-    # Adding records
-    def add_record(self, record: Record):
+        self.filename = filename
+        self.lazy = lazy
+        self.storage = open_storage(filename)
+        if self.storage.queryable:
+            self.data = self.storage.records(self.record_from_dict)
+        elif lazy:
+            self.data = LazyRecords(self.record_from_dict)
+        # Records changed since the last save: name -> Record, or None for deleted records
+        self.changes = {}
+        # Called after every change of the book, e.g. by an AutoSaver
+        self.on_change = None
+        self.search_index = NGramIndex()
+        self.birthday_index = BirthdayIndex()
+        self.contact_index = ContactIndex()
+        self.indexes = [self.search_index, self.birthday_index, self.contact_index]
+        # The indexes built so far, each one on its first query; they are kept up to date on every change
+        self.built_indexes = []
+        self.indexed = False  # All indexes are built
+        if self.storage.queryable:
+            # The database is the index
+            self.indexes = []
+            self.indexed = True
+        # Incremented on every change, drops the cached search results
+        self.version = 0
+        self.search_cache = SearchCache(self)
+        self.load()
+
+    # Adding records. Raises ValueError if a phone or an email of the record belongs to another record.
+    # check=False skips that check, e.g. to put back a record that was in the book before.
+    def add_record(self, record: Record, check=True):
+        if check:
+            self.check_unique(record, [phone.value for phone in record.phones],
+                              [email.value for email in record.emails])
+        replaced = self.data.get(record.name.name)
+        if replaced is not None and replaced is not record:
+            self.unindex(replaced)
+            replaced.book = None
+
+        record.book = self
         self.data[record.name.name] = record
+        self.changes[record.name.name] = record
+        self.version += 1
+        self.index(record)
+        self.notify()
 
     # Search for records by name
     def find(self, name):
         return self.data.get(name, None)
 
+    # Returns the record with the phone number (in any format, e.g. "(050) 123-45-67"), None if there is none
+    def find_by_phone(self, phone):
+        records = self.records_by_phone(phone)
+        return records[0] if records else None
+
+    # Returns the record with the email address (case-insensitive), None if there is none
+    def find_by_email(self, email):
+        records = self.records_by_email(email)
+        return records[0] if records else None
+
+    def records_by_phone(self, phone):
+        if self.storage.queryable:
+            return self.data.find_phone(phone)
+        self.build_index(self.contact_index)
+        return self.contact_index.find_phone(phone)
+
+    def records_by_email(self, email):
+        if self.storage.queryable:
+            return self.data.find_email(email)
+        self.build_index(self.contact_index)
+        return self.contact_index.find_email(email)
+
+    # Raises ValueError if one of the phones or emails belongs to another record than owner.
+    # A record with the name of owner is not another record: owner replaces it.
+    def check_unique(self, owner, phones=(), emails=()):
+        for kind, values, lookup in (("Phone", phones, self.records_by_phone), ("Email", emails, self.records_by_email)):
+            for value in values:
+                for other in lookup(value):
+                    if other is not owner and other.name.name != owner.name.name:
+                        raise ValueError(f"{kind} {value} already belongs to {other.name.name}")
+
     # Delete records by name
     def delete(self, name):
         if name in self.data:
-            self.data.pop(name)
+            record = self.data.pop(name)
+            record.book = None
+            self.unindex(record)
+            self.changes[name] = None
+            self.version += 1
+            self.notify()
             return f"{name} has been deleted from the AddressBook"
         return f"{name} is not in the AddressBook"
 
-    # Restore the address book from disk
+    # Called by a record of this book after each of its changes
+    def record_changed(self, record):
+        self.changes[record.name.name] = record
+        self.version += 1
+        if self.storage.queryable:
+            self.data[record.name.name] = record  # Write the change through to the database
+        self.index(record)
+        self.notify()
+
+    def notify(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    # Adds a record to the built indexes or updates it there
+    def index(self, record):
+        for index in self.built_indexes:
+            index.add(record)
+
+    # Removes a record from the built indexes
+    def unindex(self, record):
+        for index in self.built_indexes:
+            index.remove(record)
+
+    # Builds one index on its first query
+    def build_index(self, index):
+        if index in self.built_indexes:
+            return
+        self.built_indexes.append(index)
+        for record in self.data.values():
+            index.add(record)
+
+    # Builds all indexes
+    def build_indexes(self):
+        if self.indexed:
+            return
+        for index in self.indexes:
+            self.build_index(index)
+        self.indexed = True
+
+    # Restore the address book from the snapshot and the journal
+    def load(self):
+        self.load_records(self.storage.load())
+        self.changes.clear()
+
+    # Save the changes made since the last save to the journal
+    def save(self):
+        changes = self.take_changes()
+        if changes:
+            self.storage.append(changes)
+
+    # Takes the changes made since the last save as (name, record dictionary) pairs, None for deleted records.
+    # The dictionaries are a copy, they can be written by another thread while the records change.
+    def take_changes(self):
+        changes = [(name, record.to_dict() if record is not None else None) for name, record in self.changes.items()]
+        self.changes.clear()
+        return changes
+
+    # Wait for the background work of the storage to finish
+    def close(self):
+        self.save()
+        self.storage.close()
+
+    # Restore the address book from a JSON file
     def load_from_json(self, filename):
         try:
-            with open(filename, "r") as file:
-                records_data = json.load(file)
-
-                for name, data in records_data.items():
-                    record = Record(data["name"])
-
-                    for phone_number in data["phones"]:
-                        record.add_phone(phone_number)
-
-                    for email_address in data["emails"]:
-                        record.add_email(email_address)
-
-                    if "address" in data:
-                        record.address = data["address"]
-
-                    if data["birthday"] != "not set":
-                        record.add_birthday(data["birthday"])
-
-                    if "notes" in data:
-                        record.notes = data["notes"]
-
-                    self.data[name] = record
-
+            with open(filename, "rb") as file:
+                self.load_records(iter_book(file))
         except FileNotFoundError:
             pass
 
-    def filter_contacts_by_birthday(self, days):
-        now = datetime.now()
-
-        def is_birthday_soon(contact):
-            if not contact.birthday:
-                return False
-
-            bd = contact.birthday.birthday.replace(year=now.year)
-            if bd < now:
-                bd = bd.replace(year=now.year + 1)
-
-            days_to_bdd = (bd.date() - now.date()).days
-            return 0 <= days_to_bdd <= days
-
-        return list(filter(is_birthday_soon, self.data.values()))
+    # Add records from (name, dictionary representation) pairs
+    def load_records(self, records_data):
+        self.version += 1
+        if self.storage.queryable:
+            # The records are built to validate them and go straight to the database
+            for name, data in records_data:
+                self.data[name] = self.record_from_dict(data)
+            return
+
+        for name, data in records_data:
+            if self.built_indexes and name in self.data:
+                self.unindex(self.data[name])
+
+            if self.lazy and not self.built_indexes:
+                self.data[name] = data
+            else:
+                record = self.record_from_dict(data)
+                self.data[name] = record
+                self.index(record)
+
+    # Builds a record of this book from its dictionary representation
+    def record_from_dict(self, data):
+        record = Record.from_dict(data)
+        record.book = self
+        return record
+
+    # Yields (name, record dictionary) pairs for all records
+    def record_dicts(self):
+        if self.lazy or self.storage.queryable:
+            yield from self.data.record_dicts()
+        else:
+            for name, record in self.data.items():
+                yield name, record.to_dict()
 
-    # Save the address book to disk
+    # Returns the contacts with a birthday within the given number of days, nearest first
+    def filter_contacts_by_birthday(self, days):
+        if self.storage.queryable:
+            return self.data.upcoming_birthdays(days)
+        self.build_indexes()
+        return self.birthday_index.upcoming(days)
+
+    # Save the whole address book to disk.
+    # Writing to the book's own file replaces its snapshot and drops the journal.
+    # The records are encoded one by one as they are written, the book is never copied into a dictionary.
     def save_to_json(self, filename):
-        records_data = {name: record.to_dict() for name, record in self.data.items()}
-        with open(filename, "w") as file:
-            json.dump(records_data, file, indent=3)
+        if filename == self.filename:
+            self.storage.write_snapshot(self.record_dicts())
+            self.changes.clear()
+        else:
+            atomic_write_book(filename, self.record_dicts())
 
     # Performs a search in the address book by the username or phone number.
-    # Supports partial search by name or phone number.
+    # Supports partial search by name, phone number, email, address or birthday.
     def find_data_in_book(self, search_string):
-        found_users = set()
-
-        for record in self.data.values():
-            if search_string.lower() in record.name.name.lower():
-                found_users.add(record)
-
-            for phone in record.phones:
-                if search_string.lower() in phone.value.lower():
-                    found_users.add(record)
-
-            for email in record.emails:
-                if search_string.lower() in email.value.lower():
-                    found_users.add(record)
-
-            if record.address and search_string.lower() in record.address.lower():
-                found_users.add(record)
-
-            if record.birthday and search_string.lower() in str(record.birthday).lower():
-                found_users.add(record)
-
-        return list(found_users)
+        for found in self.search_steps(search_string):
+            pass
+        return list(found)
+
+    # The same search split into steps (see NGramIndex.search_steps): yields None while working
+    # and the list of found records at the end. Results are cached until the book changes,
+    # and a search string containing a cached one only checks the records found for that one.
+    def search_steps(self, search_string, chunk_size=5000):
+        self.build_indexes()
+        search_string = search_string.lower()
+        version = self.version  # The book may change between the steps of the search
+
+        found = self.search_cache.get(search_string)
+        if found is None:
+            if self.storage.queryable:
+                found = self.data.search(search_string)
+            else:
+                candidates = self.search_cache.superset(search_string)
+                for found in self.search_index.search_steps(search_string, candidates, chunk_size):
+                    if found is None:
+                        yield None
+            self.search_cache.put(search_string, found, version)
+        yield found
 
 # Generation of a random birthdate
 def generate_random_birthdate(start_date='1970-01-01', end_date='2000-12-31', date_format='%Y-%m-%d'):
+    import random  # Only needed here and for the example below, not imported at the start of the application
+
     start_date = datetime.strptime(start_date, date_format)
     end_date = datetime.strptime(end_date, date_format)
 
@@ -360,6 +681,8 @@ def generate_random_birthdate(start_date='1970-01-01', end_date='2000-12-31', da
 
 
 if __name__ == "__main__":
+    import random
+
     # Creating a new address book
     # If the address_book.json file exists, it will be automatically loaded
     book = AddressBook()
@@ -379,7 +702,7 @@ if __name__ == "__main__":
     print("Search by partial phone number")
     book.find_data_in_book("098765")
 
-    # Save the address book to a file
-    book.save_to_json("address_book.json")
+    # Save the changes to a file
+    book.close()
 
     print("Good bye!")
@@ -1,30 +1,48 @@
+import os
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 from datetime import datetime
 
-from classAddressBook import AddressBook, Record
-from sorter import *
+from classAddressBook import AddressBook, AddressBookIterator, Record, Phone, Email, Birthday
+from autosave import AutoSaver
 
 
 class MainApplication(tk.Tk):
     """
     The Main Application class for managing an address book and displaying various functionalities.
+    The window is shown right away; the address book is loaded and indexed in a background thread,
+    and the widgets working with it are enabled when it is ready.
+    Changes of the book are saved in the background by an AutoSaver shortly after the last change.
 
     Attributes:
-        address_book (AddressBook): An instance of the AddressBook class for managing contacts.
+        address_book (AddressBook): An instance of the AddressBook class for managing contacts, None while loading.
+        autosaver (AutoSaver): Saves the changes of the address book, None while loading.
         event_time (datetime): The target event time for the countdown timer.
         remaining_time (timedelta): The time remaining until the target event.
 
     Methods:
         __init__(self): Initializes the MainApplication instance.
         center_window(self): Centers the application window on the screen.
+        load_address_book(self): Loads the address book, runs in a background thread.
+        check_loaded(self): Enables the widgets working with the address book once it is loaded.
+        show_save_error(self, error): Reports a failed save of the address book.
         add_buttons(self): Adds buttons for managing contacts and triggering additional functionalities.
         add_treeview(self): Adds a Treeview widget for displaying contact information.
-        search_contacts(self, tree, search_string): Searches and displays contacts based on a search string.
+        search_contacts(self, results_view, search_string): Searches and displays contacts based on a search string.
+        show_results(self, results_view, found_contacts): Displays found contacts sorted by name.
+        schedule_search(self, results_view, search_string): Starts a search after a short pause in typing.
+        run_search_step(self, results_view, search_steps): Runs one step of a search and schedules the next one.
+        cancel_search(self): Cancels the scheduled or running search.
         show_birthday_contacts(self): Displays contacts with upcoming birthdays.
         show_sorting_files_window(self): Displays the Sorting Files window.
         update_timer(self): Updates and displays the countdown timer to the specified event.
+        on_close(self): Saves pending changes of the address book and closes the application.
     """
+    SEARCH_DELAY = 150  # ms of no typing before a search starts
+    LOAD_POLL_INTERVAL = 100  # ms
+    AUTOSAVE_DELAY = 1000  # ms of no changes before they are saved
+
     def __init__(self):
         """
         Initializes the MainApplication instance.
@@ -37,15 +55,29 @@ class MainApplication(tk.Tk):
         self.geometry(f"{self.width}x{self.height}")
         self.center_window()
 
-        self.address_book = address_book
+        self.address_book = None
+        self.autosaver = None
+        self.load_error = None
+        self.search_job = None
+        # Widgets that are enabled once the address book is loaded
+        self.book_widgets = []
 
         # Add labels
         label = tk.Label(self, text="ADDRESS BOOK MANAGEMENT:", font=("Calibri", 13))
         label.grid(row=0, column=0, columnspan=4, pady=10)
 
+        self.status_label = tk.Label(self, text="Loading address book...", font=("Helvetica", 8))
+        self.status_label.grid(row=0, column=4, columnspan=2, padx=5, pady=10, sticky='e')
+
         self.add_buttons()
         self.add_treeview()
 
+        for widget in self.book_widgets:
+            widget.config(state=tk.DISABLED)
+        self.loader = threading.Thread(target=self.load_address_book, name="address-book-loader", daemon=True)
+        self.loader.start()
+        self.check_loaded()
+
         event_time = datetime(datetime.now().year + 1, 1, 1, 0, 0, 0)
         
         self.event_time = event_time
@@ -57,6 +89,8 @@ class MainApplication(tk.Tk):
 
         self.update_timer()
 
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
     def center_window(self):        
         """
         Centers the application window on the screen.
@@ -72,6 +106,42 @@ class MainApplication(tk.Tk):
 
         self.geometry(f'+{x}+{y}')
 
+    def load_address_book(self):
+        """
+        Loads the address book, runs in a background thread.
+        The records are built and indexed on the first search, not to delay the start.
+        """
+        try:
+            address_book = AddressBook(lazy=True)
+        except Exception as error:
+            self.load_error = error
+        else:
+            self.address_book = address_book
+
+    def check_loaded(self):
+        """
+        Enables the widgets working with the address book once it is loaded.
+        """
+        if self.loader.is_alive():
+            self.after(self.LOAD_POLL_INTERVAL, self.check_loaded)
+            return
+
+        if self.load_error:
+            self.status_label.config(text="Address book was not loaded", fg='red')
+            messagebox.showerror("Error", f"Address book was not loaded: {self.load_error}")
+            return
+
+        self.status_label.config(text="")
+        self.autosaver = AutoSaver(self, self.address_book, self.AUTOSAVE_DELAY, on_error=self.show_save_error)
+        for widget in self.book_widgets:
+            widget.config(state=tk.NORMAL)
+
+    def show_save_error(self, error):
+        """
+        Reports a failed save of the address book. The changes are kept and saved again with the next change.
+        """
+        messagebox.showerror("Error", f"Changes were not saved: {error}")
+
     def add_buttons(self):
         """
         Adds buttons for managing contacts and triggering additional functionalities.
@@ -82,15 +152,15 @@ class MainApplication(tk.Tk):
         HEIGHT = 2
 
         # For "Add". Button 1:
-        btn_add_contact = tk.Button(self, text="Add", command=lambda: AddContactWindow(self, address_book), width=WIDTH, height=HEIGHT)
+        btn_add_contact = tk.Button(self, text="Add", command=lambda: AddContactWindow(self, self.address_book), width=WIDTH, height=HEIGHT)
         btn_add_contact.grid(row=1, column=0, sticky="w", padx=PADX, pady=PADY)
 
         # For "Change". Button 2:
-        btn_change_contact = tk.Button(self, text="Change", command=lambda: ChangeContactWindow(self, address_book), width=WIDTH, height=HEIGHT)
+        btn_change_contact = tk.Button(self, text="Change", command=lambda: ChangeContactWindow(self, self.address_book), width=WIDTH, height=HEIGHT)
         btn_change_contact.grid(row=1, column=1, sticky="w", padx=PADX, pady=PADY)
 
         # For "Delete". Button 3:
-        btn_delete_contact = tk.Button(self, text="Delete", command=lambda: DeleteWindow(self, address_book), width=WIDTH, height=HEIGHT)
+        btn_delete_contact = tk.Button(self, text="Delete", command=lambda: DeleteWindow(self, self.address_book), width=WIDTH, height=HEIGHT)
         btn_delete_contact.grid(row=1, column=2, sticky="w", padx=PADX, pady=PADY)
 
         # Add an empty label as a spacer between the two groups of buttons
@@ -101,6 +171,8 @@ class MainApplication(tk.Tk):
         btn_birthday_contacts = tk.Button(self, text="Birthday Contacts", command=self.show_birthday_contacts, width=WIDTH, height=HEIGHT)
         btn_birthday_contacts.grid(row=1, column=4, sticky="w", padx=PADX, pady=PADY)
 
+        self.book_widgets.extend([btn_add_contact, btn_change_contact, btn_delete_contact, btn_birthday_contacts])
+
         # For Other. "Sorting Files". Button 5:
         btn_sorting_files = tk.Button(self, text="Sorting files", command=self.show_sorting_files_window, width=WIDTH, height=HEIGHT)
         btn_sorting_files.grid(row=1, column=5, sticky="w", padx=PADX, pady=PADY)
@@ -119,14 +191,8 @@ class MainApplication(tk.Tk):
             "Notes": {"text": "Notes", "width": 260},
         }
 
-        tree = ttk.Treeview(self, columns=list(columns_info.keys()), show="headings")
-
-        for col, info in columns_info.items():
-            tree.heading(col, text=info["text"])
-            tree.column(col, width=info["width"])
-
-        tree.grid(row=2, column=0, columnspan=6, padx=10, pady=10)
-        tree.config(height=20)
+        results_view = ResultsView(self, columns_info, rows=20)
+        results_view.grid(row=2, column=0, columnspan=6, padx=10, pady=10)
 
         # Add search entry and button
         label = tk.Label(self, text="Enter search string:")
@@ -136,40 +202,77 @@ class MainApplication(tk.Tk):
         search_entry = tk.Entry(self, textvariable=search_var, width=40)
         search_entry.grid(row=3, column=1, padx=10, pady=5, sticky=tk.W)
 
-        btn_search = tk.Button(self, text="Search", command=lambda: self.search_contacts(tree, search_var.get()), width=16, height=1)
+        btn_search = tk.Button(self, text="Search", command=lambda: self.search_contacts(results_view, search_var.get()), width=16, height=1)
         btn_search.grid(row=3, column=2, padx=10, pady=5, sticky=tk.W)
 
+        # Search as you type
+        search_var.trace_add("write", lambda *args: self.schedule_search(results_view, search_var.get()))
+
+        self.book_widgets.extend([search_entry, btn_search])
 
-    def search_contacts(self, tree, search_string):
+
+    def search_contacts(self, results_view, search_string):
         """
         Searches and displays contacts based on a search string.
 
         Parameters:
-            tree (ttk.Treeview): The Treeview widget to display search results.
+            results_view (ResultsView): The view to display search results.
             search_string (str): The string to search for in contacts.
         """
-        # Clear Treeview content before a new search
-        tree.delete(*tree.get_children())
-
-        found_contacts = self.address_book.find_data_in_book(search_string)
-
-        # Display found contacts in Treeview
-        if found_contacts:
-            for record in found_contacts:
-                record_data = {
-                    "Name": record.name.name,
-                    "Phone": ", ".join(phone.value for phone in record.phones),
-                    "Email": ", ".join(email.value for email in record.emails),
-                    "Address": record.address if record.address else "N/A",
-                    "Birthday": str(record.birthday) if record.birthday else "N/A",
-                    "Notes": record.notes if record.notes else "N/A",
-                }
-                tree.insert("", "end", text="ID", values=(record_data["Name"], record_data["Phone"],
-                                                            record_data["Email"], record_data["Address"],
-                                                            record_data["Birthday"], record_data["Notes"]))
-        else:
+        self.cancel_search()
+        self.show_results(results_view, self.address_book.find_data_in_book(search_string))
+
+    def show_results(self, results_view, found_contacts):
+        """
+        Displays found contacts sorted by name.
+
+        Parameters:
+            results_view (ResultsView): The view to display search results.
+            found_contacts (list): The found records.
+        """
+        names = sorted(record.name.name for record in found_contacts)
+
+        # Only the rows that are currently visible get formatted and shown
+        results_view.show(AddressBookIterator(self.address_book, per_page=results_view.rows, keys=names))
+
+        if not found_contacts:
             print("No results found")
 
+    def schedule_search(self, results_view, search_string):
+        """
+        Starts a search after a short pause in typing. A search that is scheduled or still running is cancelled.
+
+        Parameters:
+            results_view (ResultsView): The view to display search results.
+            search_string (str): The string to search for in contacts.
+        """
+        self.cancel_search()
+        self.search_job = self.after(self.SEARCH_DELAY, self.run_search_step, results_view,
+                                     self.address_book.search_steps(search_string))
+
+    def run_search_step(self, results_view, search_steps):
+        """
+        Runs one step of a search and schedules the next one, so typing is handled between the steps.
+
+        Parameters:
+            results_view (ResultsView): The view to display search results.
+            search_steps (generator): The steps of the search, see AddressBook.search_steps.
+        """
+        self.search_job = None
+        found_contacts = next(search_steps)
+        if found_contacts is None:
+            self.search_job = self.after(1, self.run_search_step, results_view, search_steps)
+        else:
+            self.show_results(results_view, found_contacts)
+
+    def cancel_search(self):
+        """
+        Cancels the scheduled or running search.
+        """
+        if self.search_job is not None:
+            self.after_cancel(self.search_job)
+            self.search_job = None
+
     def show_birthday_contacts(self):
         """
         Displays contacts with upcoming birthdays.
@@ -202,6 +305,150 @@ class MainApplication(tk.Tk):
 
         self.after(1000, self.update_timer)
 
+    def on_close(self):
+        """
+        Saves pending changes of the address book and closes the application.
+        """
+        if self.address_book is not None:
+            try:
+                # The AutoSaver is created by check_loaded, up to LOAD_POLL_INTERVAL after the book is loaded
+                if self.autosaver is not None:
+                    self.autosaver.close()
+            except Exception as error:
+                self.show_save_error(error)
+            self.address_book.close()
+        self.destroy()
+
+
+class ResultsView(tk.Frame):
+    """
+    A Treeview with a scrollbar that displays a list of contacts of any length.
+
+    Only the rows that fit into the view exist as Treeview items. Scrolling puts other values into these items
+    instead of inserting and deleting items, so it costs O(rows) regardless of the number of results.
+    The values are taken from pages fetched through an AddressBookIterator and cached.
+
+    Attributes:
+        rows (int): The number of visible rows.
+        iterator (AddressBookIterator): The displayed contacts.
+        offset (int): The index of the contact in the first visible row.
+
+    Methods:
+        __init__(self, parent, columns_info, rows): Initializes the ResultsView instance.
+        show(self, iterator): Displays the contacts of the iterator from the first one.
+        render(self): Puts the values of the visible contacts into the Treeview rows.
+        scroll_to(self, offset): Makes the contact with the given index the first visible one.
+        record_values(record): Returns the column values of a contact.
+    """
+    CACHED_PAGES = 16
+
+    def __init__(self, parent, columns_info, rows=20):
+        """
+        Initializes the ResultsView instance.
+
+        Parameters:
+            parent (tk.Widget): The parent widget.
+            columns_info (dict): Column name -> {"text": heading, "width": width in pixels}.
+            rows (int): The number of visible rows.
+        """
+        super().__init__(parent)
+        self.rows = rows
+        self.iterator = None
+        self.offset = 0
+        self.pages = {}
+
+        self.tree = ttk.Treeview(self, columns=list(columns_info.keys()), show="headings", height=rows)
+        for col, info in columns_info.items():
+            self.tree.heading(col, text=info["text"])
+            self.tree.column(col, width=info["width"])
+        self.tree.grid(row=0, column=0)
+
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.on_scrollbar)
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        for widget in (self.tree, self.scrollbar):
+            widget.bind("<MouseWheel>", self.on_mouse_wheel)  # Windows, macOS
+            widget.bind("<Button-4>", lambda event: self.scroll_to(self.offset - 3))  # X11
+            widget.bind("<Button-5>", lambda event: self.scroll_to(self.offset + 3))
+
+        self.render()
+
+    def show(self, iterator):
+        """
+        Displays the contacts of the iterator from the first one.
+        """
+        self.iterator = iterator
+        self.pages.clear()
+        self.offset = 0
+        self.render()
+
+    def render(self):
+        """
+        Puts the values of the visible contacts into the Treeview rows.
+        """
+        total = len(self.iterator) if self.iterator else 0
+        visible = max(0, min(self.rows, total - self.offset))
+
+        items = self.tree.get_children()
+        if len(items) > visible:
+            self.tree.delete(*items[visible:])
+            items = items[:visible]
+        for index, item in enumerate(items):
+            self.tree.item(item, values=self.row_values(self.offset + index))
+        for index in range(len(items), visible):
+            self.tree.insert("", "end", values=self.row_values(self.offset + index))
+
+        if total:
+            self.scrollbar.set(self.offset / total, (self.offset + visible) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def row_values(self, index):
+        page_number, position = divmod(index, self.iterator.per_page)
+        page = self.pages.get(page_number)
+        if page is None:
+            if len(self.pages) >= self.CACHED_PAGES:
+                self.pages.clear()
+            page = [self.record_values(record) for record in self.iterator.get_page(page_number)]
+            self.pages[page_number] = page
+        return page[position]
+
+    @staticmethod
+    def record_values(record):
+        """
+        Returns the column values of a contact.
+        """
+        if record is None:
+            return ("(deleted)", "", "", "", "", "")
+        return (record.name.name,
+                ", ".join(phone.value for phone in record.phones),
+                ", ".join(email.value for email in record.emails),
+                record.address if record.address else "N/A",
+                str(record.birthday) if record.birthday else "N/A",
+                record.notes if record.notes else "N/A")
+
+    def scroll_to(self, offset):
+        """
+        Makes the contact with the given index the first visible one.
+        """
+        total = len(self.iterator) if self.iterator else 0
+        offset = max(0, min(offset, total - self.rows))
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def on_scrollbar(self, action, value, unit=None):
+        total = len(self.iterator) if self.iterator else 0
+        if action == "moveto":
+            self.scroll_to(round(float(value) * total))
+        elif unit == "pages":
+            self.scroll_to(self.offset + int(value) * self.rows)
+        else:
+            self.scroll_to(self.offset + int(value))
+
+    def on_mouse_wheel(self, event):
+        self.scroll_to(self.offset - 3 if event.delta > 0 else self.offset + 3)
+
 
 class AddContactWindow(tk.Toplevel):
     """
@@ -244,7 +491,7 @@ class AddContactWindow(tk.Toplevel):
         self.name_label.grid(row=0, column=0, padx=10, pady=5, sticky=tk.E)
 
         # List of names for the Combobox
-        existing_names = [record.name.name for record in self.address_book.data.values()]
+        existing_names = list(self.address_book.data.keys())
         self.name_var = tk.StringVar()
         self.name_combobox = ttk.Combobox(self, textvariable=self.name_var, values=existing_names, width=37)
         self.name_combobox.set("Select or Enter Name")
@@ -355,15 +602,11 @@ class AddContactWindow(tk.Toplevel):
 
                 self.address_book.add_record(new_record)
 
-            # Save the changes and close the window
-            self.address_book.save_to_json("address_book.json")
-
         except ValueError as e:
             self.grab_set()
             messagebox.showerror("Error", str(e))
             self.grab_release()
         else:
-            self.address_book.save_to_json("address_book.json")
             messagebox.showinfo("Contact added", f"Contact name: {name}\nPhone number: {phone}\nEmail: {email}\nAddress: {address}\nBirthday: {birthday}")
             self.destroy()
 
@@ -427,7 +670,7 @@ class ChangeContactWindow(tk.Toplevel):
         self.select_phone_label.grid(row=2, column=0, padx=10, pady=5, sticky=tk.E)
 
         self.selected_phone_var = tk.StringVar()
-        self.phone_combobox = ttk.Combobox(self, textvariable=self.selected_phone_var, values=[], width=30)
+        self.phone_combobox = ttk.Combobox(self, textvariable=self.selected_phone_var, values=[], width=30, state="readonly")
         self.phone_combobox.grid(row=2, column=1, padx=10, pady=5, sticky=tk.W)
 
         # Text field for entering the new phone number
@@ -443,7 +686,7 @@ class ChangeContactWindow(tk.Toplevel):
         self.select_email_label.grid(row=4, column=0, padx=10, pady=5, sticky=tk.E)
 
         self.selected_email_var = tk.StringVar()
-        self.email_combobox = ttk.Combobox(self, textvariable=self.selected_email_var, values=[], width=30)
+        self.email_combobox = ttk.Combobox(self, textvariable=self.selected_email_var, values=[], width=30, state="readonly")
         self.email_combobox.grid(row=4, column=1, padx=10, pady=5, sticky=tk.W)
 
         # Text field for entering the new email
@@ -542,37 +785,64 @@ class ChangeContactWindow(tk.Toplevel):
 
         contact = self.address_book.find(selected_contact)
         if contact:
+            # Validate the new values and check all phones and emails of the edited contact, the way add_record
+            # below does, before changing anything: the deletion below is saved on its own
+            try:
+                phones = [phone.value for phone in contact.phones]
+                emails = [email.value for email in contact.emails]
+                if selected_phone and not contact.find_phone(selected_phone):
+                    raise ValueError(f"Phone {selected_phone} not found")
+                if selected_email and selected_email not in emails:
+                    raise ValueError(f"Email {selected_email} not found")
+                if selected_phone and new_phone:
+                    new_value = Phone(new_phone).value
+                    phones = [new_value if phone == selected_phone else phone for phone in phones]
+                if selected_email and new_email:
+                    new_value = Email(new_email).value
+                    emails = [new_value if email == selected_email else email for email in emails]
+                if new_birthday:
+                    Birthday(new_birthday)
+                contact.check_unique(phones=phones, emails=emails)
+            except ValueError as e:
+                messagebox.showerror("Error", str(e) or "Invalid phone, email or birthday")
+                return
+
+            original = contact.to_dict()
+
             # Remove the old contact from the address book
             self.address_book.delete(selected_contact)
 
-            # Update the contact name if a new name is provided
-            if new_name:
-                contact.name.name = new_name
+            try:
+                # Update the contact name if a new name is provided
+                if new_name:
+                    contact.name.name = new_name
 
-            # Update the phone number if a new phone number is provided
-            if selected_phone and new_phone:
-                contact.edit_phone(selected_phone, new_phone)
+                # Update the phone number if a new phone number is provided
+                if selected_phone and new_phone:
+                    contact.edit_phone(selected_phone, new_phone)
 
-            # Update the email if a new email is provided
-            if selected_email and new_email:
-                contact.edit_email(selected_email, new_email)
+                # Update the email if a new email is provided
+                if selected_email and new_email:
+                    contact.edit_email(selected_email, new_email)
 
-            # Update the address if a new address is provided
-            contact.address = new_address
+                # Update the address if a new address is provided
+                contact.address = new_address
 
-            # Update the birthday if a new birthday is provided
-            if new_birthday:
-                contact.add_birthday(new_birthday)
+                # Update the birthday if a new birthday is provided
+                if new_birthday:
+                    contact.add_birthday(new_birthday)
 
-            # Update notes
-            notes = self.notes_text.get("1.0", tk.END).strip()
-            contact.notes = notes
-
-            # Add the updated contact back to the address book
-            self.address_book.add_record(contact)
+                # Update notes
+                notes = self.notes_text.get("1.0", tk.END).strip()
+                contact.notes = notes
 
-            # Save changes to the address book
-            self.address_book.save_to_json("address_book.json")
+                # Add the updated contact back to the address book
+                self.address_book.add_record(contact)
+            except ValueError as e:
+                # Put the contact back as it was
+                self.address_book.add_record(self.address_book.record_from_dict(original), check=False)
+                messagebox.showerror("Error", str(e) or "The contact was not changed")
+                return
 
             # Close the window
             self.destroy()
@@ -632,19 +902,19 @@ class DeleteWindow(tk.Toplevel):
         """
         Opens the DeleteContactWindow to delete a contact.
         """
-        DeleteContactWindow(self, address_book)
+        DeleteContactWindow(self, self.address_book)
 
     def delete_phone(self):
         """
         Opens the DeletePhoneWindow to delete a phone number.
         """
-        DeletePhoneWindow(self, address_book)
+        DeletePhoneWindow(self, self.address_book)
 
     def delete_email(self):
         """
         Opens the DeleteEmailWindow to delete an email.
         """
-        DeleteEmailWindow(self, address_book)
+        DeleteEmailWindow(self, self.address_book)
 
 
 class DeleteContactWindow(tk.Toplevel):
@@ -716,9 +986,6 @@ class DeleteContactWindow(tk.Toplevel):
 
                 messagebox.showinfo("Delete Contact", "Contact deletion successfully completed.")
 
-                # Save changes to the address book
-                self.address_book.save_to_json("address_book.json")
-
                 # Close the window
                 self.destroy()
             else:
@@ -833,9 +1100,6 @@ class DeletePhoneWindow(tk.Toplevel):
 
                 messagebox.showinfo("Delete Phone", "Phone number deletion successfully completed")
 
-                # Save changes to the address book
-                self.address_book.save_to_json("address_book.json")
-
                 # Close the window
                 self.destroy()
         else:
@@ -947,9 +1211,6 @@ class DeleteEmailWindow(tk.Toplevel):
 
                 messagebox.showinfo("Delete Email", "Email address deletion successfully completed.")
 
-                # Save changes to the address book
-                self.address_book.save_to_json("address_book.json")
-
                 self.destroy()
         else:
             messagebox.showerror("Error", "Selected contact or email address not found")
@@ -958,17 +1219,28 @@ class DeleteEmailWindow(tk.Toplevel):
 class SortingFilesWindow(tk.Toplevel):
     """
     A Toplevel window for configuring and initiating the sorting of files in a specified directory.
+    Sorting runs in a background thread, the window polls its progress with after() so the application stays responsive.
 
     Attributes:
         main_app: The main application instance.
         path_var (tk.StringVar): A Tkinter variable to store the path for sorting.
+        mode_var (tk.StringVar): A Tkinter variable with the sorting mode: copy, move or hardlink.
+        workers_var (tk.IntVar): A Tkinter variable with the number of threads copying files.
+        dedup_var (tk.BooleanVar): A Tkinter variable, True to store byte-identical files once.
+        incremental_var (tk.BooleanVar): A Tkinter variable, True to sort only new and changed files.
+        progress_var (tk.StringVar): A Tkinter variable with the progress of the running sort.
+        sort_run (SortRun): The running sort, None before it is started.
 
     Methods:
         __init__(self, main_app): Initializes the SortingFilesWindow instance.
         center_window(self): Centers the window on the screen.
-        sorting_files(self): Initiates the sorting of files based on the specified path.
+        sorting_files(self): Starts the sorting of files based on the specified path.
+        poll_progress(self): Shows the progress of the running sort and reports its result when it is finished.
+        cancel(self): Cancels the running sort or closes the window.
     """
 
+    POLL_INTERVAL = 200  # ms
+
     def __init__(self, main_app):
         """
         Initializes the SortingFilesWindow instance.
@@ -978,10 +1250,20 @@ class SortingFilesWindow(tk.Toplevel):
         """
         tk.Toplevel.__init__(self, main_app)
 
+        # The sorter is imported on first use, it is not needed to start the application
+        import sorter
+        self.sorter = sorter
+
         self.title("Sorting Files")
         self.iconbitmap('icon.ico')
 
         self.path_var = tk.StringVar()
+        self.mode_var = tk.StringVar(value="copy")
+        self.workers_var = tk.IntVar(value=4)
+        self.dedup_var = tk.BooleanVar(value=False)
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.progress_var = tk.StringVar()
+        self.sort_run = None
 
         # Text input fields
         path_label = tk.Label(self, text="Path for Sorting:")
@@ -991,12 +1273,35 @@ class SortingFilesWindow(tk.Toplevel):
         path_label.grid(row=0, column=0, padx=10, pady=5, sticky="w")
         path_entry.grid(row=0, column=1, padx=10, pady=5)
 
+        # Sorting options
+        mode_label = tk.Label(self, text="Mode:")
+        mode_combobox = ttk.Combobox(self, textvariable=self.mode_var, values=sorter.MODES, width=27)
+        mode_combobox.state(['readonly'])
+        workers_label = tk.Label(self, text="Workers:")
+        workers_spinbox = tk.Spinbox(self, from_=1, to=32, textvariable=self.workers_var, width=28)
+        dedup_checkbutton = tk.Checkbutton(self, text="Skip duplicate files", variable=self.dedup_var)
+        incremental_checkbutton = tk.Checkbutton(self, text="Only new and changed files",
+                                                 variable=self.incremental_var)
+
+        mode_label.grid(row=1, column=0, padx=10, pady=5, sticky="w")
+        mode_combobox.grid(row=1, column=1, padx=10, pady=5)
+        workers_label.grid(row=2, column=0, padx=10, pady=5, sticky="w")
+        workers_spinbox.grid(row=2, column=1, padx=10, pady=5)
+        dedup_checkbutton.grid(row=3, column=1, padx=10, pady=5, sticky="w")
+        incremental_checkbutton.grid(row=4, column=1, padx=10, pady=5, sticky="w")
+
         # Buttons "Save" and "Cancel"
-        save_button = tk.Button(self, text="Save", command=self.sorting_files, width=10, height=1)
-        cancel_button = tk.Button(self, text="Cancel", command=self.destroy, width=10, height=1)
+        self.save_button = tk.Button(self, text="Save", command=self.sorting_files, width=10, height=1)
+        cancel_button = tk.Button(self, text="Cancel", command=self.cancel, width=10, height=1)
+
+        self.save_button.grid(row=5, column=0, sticky="e", padx=30, pady=10)
+        cancel_button.grid(row=5, column=1, sticky="e", padx=30, pady=10)
+
+        # Progress of the running sort
+        progress_label = tk.Label(self, textvariable=self.progress_var, font=("Helvetica", 8), anchor="w", width=50)
+        progress_label.grid(row=6, column=0, columnspan=2, padx=10, pady=5, sticky="w")
 
-        save_button.grid(row=1, column=0, sticky="e", padx=30, pady=10)
-        cancel_button.grid(row=1, column=1, sticky="e", padx=30, pady=10)
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
 
     def center_window(self):
         """
@@ -1015,15 +1320,44 @@ class SortingFilesWindow(tk.Toplevel):
 
     def sorting_files(self):
         """
-        Initiates the sorting of files based on the specified path.
+        Starts the sorting of files based on the specified path.
         """
-        path_s = self.path_var.get()
-        
-        # <--  Here, the logic for "Sorting Files"
-        main(f'sort {path_s}')
+        path_s = self.path_var.get().strip()
+        # An empty path would mean the working directory, i.e. the files of the application itself
+        if not path_s or not os.path.isdir(path_s):
+            messagebox.showerror("Error", "Enter the path of an existing directory", parent=self)
+            return
+
+        self.save_button.config(state=tk.DISABLED)
+        self.sort_run = self.sorter.SortRun(path_s, workers=self.workers_var.get(), mode=self.mode_var.get(),
+                                            dedup=self.dedup_var.get(), incremental=self.incremental_var.get())
+        self.sort_run.start()
+        self.poll_progress()
+
+    def poll_progress(self):
+        """
+        Shows the progress of the running sort and reports its result when it is finished.
+        """
+        sort_run = self.sort_run
+        current = sort_run.current.name if sort_run.current else ""
+        self.progress_var.set(f"Files: {sort_run.files}   Copied: {sort_run.bytes / 2 ** 20:.1f} MB   {current}")
 
-        messagebox.showinfo("Information", f"Sorting files in a directory: {path_s}")
+        if not sort_run.finished:
+            self.after(self.POLL_INTERVAL, self.poll_progress)
+            return
+
+        if sort_run.error:
+            messagebox.showerror("Information", sort_run.message())
+        else:
+            messagebox.showinfo("Information", sort_run.message())
         self.destroy()
 
+    def cancel(self):
+        """
+        Cancels the running sort or closes the window.
+        """
+        if self.sort_run and not self.sort_run.finished:
+            self.sort_run.cancel()
+        else:
+            self.destroy()
 
-address_book = AddressBook()
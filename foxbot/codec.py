@@ -0,0 +1,226 @@
+import io
+import os
+import json
+from json.decoder import scanstring
+from json.encoder import encode_basestring_ascii
+
+
+WHITESPACE = " \t\n\r"
+UTF8_BOM = b"\xef\xbb\xbf"
+
+# Schema of a record in address_book.json (see Record.to_dict). The msgspec decoder checks the records against it,
+# the encoder writes records of this shape without the generic json machinery.
+RECORD_SCHEMA = {
+    "name": str,
+    "phones": list[str],
+    "emails": list[str],
+    "address": str,
+    "birthday": str,
+    "notes": str,
+}
+
+# Decoders of a whole book in the order of preference: the fastest installed library is used,
+# the standard json module otherwise. The libraries are looked up and imported on the first use,
+# not to slow down the start.
+PREFERRED_BACKENDS = ("msgspec", "orjson", "json")
+backend = None  # The first available of PREFERRED_BACKENDS until use_backend is called
+decoders = {}
+available = []
+
+# Books larger than this are always parsed incrementally: decoding them at once would hold both the file content
+# and all decoded records in memory, whatever the backend
+WHOLE_DECODE_LIMIT = 16 * 2 ** 20
+
+
+# Returns the names of the installed decoders in the order of preference
+def available_backends():
+    if not available:
+        from importlib.util import find_spec
+        available.extend(name for name in PREFERRED_BACKENDS if name == "json" or find_spec(name) is not None)
+    return available
+
+
+# Returns the name of the decoder in use
+def current_backend():
+    global backend
+    if backend is None:
+        backend = available_backends()[0]
+    return backend
+
+
+# Selects the decoder by name, e.g. to compare them
+def use_backend(name):
+    global backend
+    if name not in available_backends():
+        raise ValueError(f"JSON backend {name} is not available")
+    backend = name
+
+
+def get_decoder(name):
+    decoder = decoders.get(name)
+    if decoder is None:
+        if name == "msgspec":
+            import msgspec
+            from typing import TypedDict
+            RecordData = TypedDict("RecordData", RECORD_SCHEMA, total=False)
+            decoder = msgspec.json.Decoder(dict[str, RecordData]).decode
+        elif name == "orjson":
+            import orjson
+            decoder = orjson.loads
+        else:
+            decoder = json.loads
+        decoders[name] = decoder
+    return decoder
+
+
+def iter_json_object(file, chunk_size=1 << 16):
+    """
+    Parses a JSON object from a file incrementally.
+    Yields (key, value) pairs of the top-level object one by one, reading the file in chunks,
+    so the whole document never has to be held in memory as a string.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        chunk = file.read(chunk_size)
+        if not chunk:
+            eof = True
+        # Drop the consumed part of the buffer
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in WHITESPACE:
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            fill()
+
+    def expect(char):
+        nonlocal pos
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", buffer, pos)
+        pos += 1
+
+    # Runs parser at the current position; the parsed value must be followed by one of the terminators
+    def parse(parser, terminators):
+        nonlocal pos
+        while True:
+            try:
+                value, end = parser(pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A value cut at the end of the buffer (e.g. "1.5" of "1.5e3") may look complete, make sure it is not
+            if not eof and (end == len(buffer) or buffer[end] not in terminators):
+                fill()
+                continue
+            pos = end
+            return value
+
+    fill()
+    skip_whitespace()
+    if buffer.startswith("\ufeff", pos):
+        pos += 1
+    expect("{")
+
+    skip_whitespace()
+    if pos < len(buffer) and buffer[pos] == "}":
+        return
+
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer) or buffer[pos] != '"':
+            raise json.JSONDecodeError("Expecting property name enclosed in double quotes", buffer, pos)
+        key = parse(lambda start: scanstring(buffer, start + 1), WHITESPACE + ":")
+        expect(":")
+        skip_whitespace()
+        value = parse(lambda start: decoder.raw_decode(buffer, start), WHITESPACE + ",}")
+        yield key, value
+
+        skip_whitespace()
+        if pos < len(buffer) and buffer[pos] == ",":
+            pos += 1
+            continue
+        expect("}")
+        return
+
+
+def load_book(file):
+    """
+    Decodes a whole book from a binary file into a dictionary: name -> record dictionary.
+    """
+    content = file.read()
+    if content.startswith(UTF8_BOM):
+        content = content[len(UTF8_BOM):]
+    return get_decoder(current_backend())(content)
+
+
+def iter_book(file):
+    """
+    Yields (name, record dictionary) pairs of a book in a binary file.
+    A book of up to WHOLE_DECODE_LIMIT bytes is decoded at once with msgspec or orjson, which is faster;
+    a larger one, or any book with the standard json module, is parsed incrementally to keep the memory use low.
+    """
+    if current_backend() != "json" and file_size(file) <= WHOLE_DECODE_LIMIT:
+        yield from load_book(file).items()
+    else:
+        yield from iter_json_object(io.TextIOWrapper(file, encoding="utf-8"))
+
+
+# Size of an open file in bytes, the remaining size for a file without a descriptor (e.g. io.BytesIO)
+def file_size(file):
+    try:
+        return os.fstat(file.fileno()).st_size
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        position = file.tell()
+        size = file.seek(0, io.SEEK_END)
+        file.seek(position)
+        return size - position
+
+
+# Encodes a record at the nesting level of the book, as json.dumps(data, indent=3) would
+def encode_record(data):
+    lines = []
+    for key, value in data.items():
+        if type(value) is str:
+            lines.append(f"      {encode_basestring_ascii(key)}: {encode_basestring_ascii(value)}")
+        elif type(value) is list and all(type(item) is str for item in value):
+            if value:
+                items = ",\n".join(f"         {encode_basestring_ascii(item)}" for item in value)
+                lines.append(f"      {encode_basestring_ascii(key)}: [\n{items}\n      ]")
+            else:
+                lines.append(f"      {encode_basestring_ascii(key)}: []")
+        else:
+            # Not a value of the schema, let the json module encode the record
+            return "\n   ".join(json.dumps(data, indent=3).split("\n"))
+    if not lines:
+        return "{}"
+    return "{\n" + ",\n".join(lines) + "\n   }"
+
+
+def write_book(records, write, chunk_size=1000):
+    """
+    Writes (name, record dictionary) pairs as a book in the format of address_book.json,
+    byte for byte the same as json.dump(book, file, indent=3) with the default ensure_ascii.
+    The output is passed to write in chunks of chunk_size records.
+    """
+    chunk = []
+    separator = "{\n"
+    for name, data in records:
+        chunk.append(f"{separator}   {encode_basestring_ascii(name)}: {encode_record(data)}")
+        separator = ",\n"
+        if len(chunk) >= chunk_size:
+            write("".join(chunk))
+            chunk.clear()
+    chunk.append("{}" if separator == "{\n" else "\n}")
+    write("".join(chunk))
@@ -0,0 +1,319 @@
+import re
+from collections import OrderedDict
+from datetime import date, timedelta
+
+
+class NGramIndex:
+    """
+    Inverted n-gram index for substring search in the address book.
+
+    Every record is represented by one lowercased string made of its searchable fields
+    (name, phones, emails, address and birthday) separated by a character that can not be typed in a search.
+    The index maps every n-gram of that string to the set of records containing it,
+    so a substring lookup only has to check the records that contain all n-grams of the search string.
+    """
+    SEPARATOR = "\x00"
+
+    def __init__(self, n=3):
+        self.n = n
+        self.postings = {}  # n-gram -> set of records
+        self.texts = {}     # record -> its searchable text
+        self.short = set()  # records whose text is shorter than n and has no n-grams at all
+
+    # Builds the searchable text of a record
+    @classmethod
+    def searchable_text(cls, record):
+        fields = [record.name.name]
+        fields.extend(phone.value for phone in record.phones)
+        fields.extend(email.value for email in record.emails)
+        if record.address:
+            fields.append(record.address)
+        if record.birthday:
+            fields.append(str(record.birthday))
+        return cls.SEPARATOR.join(fields).lower()
+
+    def grams(self, text):
+        return {text[i:i + self.n] for i in range(len(text) - self.n + 1)}
+
+    # Adds a record or re-indexes it after a change
+    def add(self, record):
+        text = self.searchable_text(record)
+        old_text = self.texts.get(record)
+        if old_text == text:
+            return
+        if old_text is not None:
+            self.remove(record)
+
+        self.texts[record] = text
+        grams = self.grams(text)
+        if not grams:
+            self.short.add(record)
+        for gram in grams:
+            records = self.postings.get(gram)
+            if records is None:
+                self.postings[gram] = {record}
+            else:
+                records.add(record)
+
+    def remove(self, record):
+        text = self.texts.pop(record, None)
+        if text is None:
+            return
+
+        self.short.discard(record)
+        for gram in self.grams(text):
+            records = self.postings[gram]
+            records.discard(record)
+            if not records:
+                del self.postings[gram]
+
+    # Returns the records that may contain the search string
+    def candidates(self, search_string):
+        if len(search_string) >= self.n:
+            posting_sets = []
+            for gram in self.grams(search_string):
+                records = self.postings.get(gram)
+                if not records:
+                    return set()
+                posting_sets.append(records)
+
+            # Intersect starting from the rarest n-gram to keep the intermediate sets small
+            posting_sets.sort(key=len)
+            found = set(posting_sets[0])
+            for records in posting_sets[1:]:
+                found &= records
+                if not found:
+                    break
+        else:
+            # A short search string is part of every n-gram that covers one of its occurrences
+            found = set()
+            for gram, records in self.postings.items():
+                if search_string in gram:
+                    found |= records
+
+        found |= self.short
+        return found
+
+    # Returns the records whose searchable fields contain the search string
+    def search(self, search_string):
+        search_string = search_string.lower()
+        texts = self.texts
+        return [record for record in self.candidates(search_string) if search_string in texts[record]]
+
+    # The same search split into steps, for callers that have to stay responsive and may abandon it:
+    # yields None after every chunk_size checked candidates and the list of found records at the end.
+    # candidates, if given, replace the candidates from the index (e.g. the results of a shorter search string).
+    def search_steps(self, search_string, candidates=None, chunk_size=5000):
+        search_string = search_string.lower()
+        texts = self.texts
+        candidates = list(self.candidates(search_string) if candidates is None else candidates)
+
+        found = []
+        for start in range(0, len(candidates), chunk_size):
+            for record in candidates[start:start + chunk_size]:
+                text = texts.get(record)  # None if the record was deleted between two steps
+                if text is not None and search_string in text:
+                    found.append(record)
+            yield None
+        yield found
+
+
+# Key of a phone number in the contact index: its digits only, "(050) 123-45-67" is 0501234567
+def normalize_phone(phone):
+    digits = re.sub(r"\D", "", phone)
+    if not digits.isascii():
+        digits = str(int(digits)).zfill(len(digits))
+    return digits
+
+
+# Key of an email address in the contact index
+def normalize_email(email):
+    return email.strip().casefold()
+
+
+class ContactIndex:
+    """
+    Hash index of the phones and emails of the records: normalized phone number or email -> records.
+    Used for exact lookups ("who owns this number") and to keep phones and emails unique in the book.
+    Normally every key has one record; a book saved before the uniqueness check may still have more.
+    """
+    def __init__(self):
+        self.phones = {}  # normalized phone -> list of records
+        self.emails = {}  # normalized email -> list of records
+        self.keys = {}    # record -> (its phone keys, its email keys)
+
+    @staticmethod
+    def keys_of(record):
+        return (tuple(normalize_phone(phone.value) for phone in record.phones),
+                tuple(normalize_email(email.value) for email in record.emails))
+
+    # Adds a record or re-indexes it after a change
+    def add(self, record):
+        keys = self.keys_of(record)
+        old_keys = self.keys.get(record)
+        if old_keys == keys:
+            return
+        if old_keys is not None:
+            self.remove(record)
+
+        self.keys[record] = keys
+        for table, table_keys in zip((self.phones, self.emails), keys):
+            for key in table_keys:
+                records = table.setdefault(key, [])
+                if record not in records:
+                    records.append(record)
+
+    def remove(self, record):
+        keys = self.keys.pop(record, None)
+        if keys is None:
+            return
+
+        for table, table_keys in zip((self.phones, self.emails), keys):
+            for key in table_keys:
+                records = table.get(key)
+                if records and record in records:
+                    records.remove(record)
+                    if not records:
+                        del table[key]
+
+    # Returns the records with the phone number
+    def find_phone(self, phone):
+        return list(self.phones.get(normalize_phone(phone), ()))
+
+    # Returns the records with the email address
+    def find_email(self, email):
+        return list(self.emails.get(normalize_email(email), ()))
+
+
+class SearchCache:
+    """
+    LRU cache of search results of an address book.
+    The whole cache is dropped as soon as the version of the book changes, i.e. after any change of the book.
+    """
+    def __init__(self, book, size=64):
+        self.book = book
+        self.size = size
+        self.version = book.version
+        self.results = OrderedDict()  # lowercased search string -> found records
+
+    def check_version(self):
+        if self.version != self.book.version:
+            self.results.clear()
+            self.version = self.book.version
+
+    def get(self, search_string):
+        self.check_version()
+        found = self.results.get(search_string)
+        if found is not None:
+            self.results.move_to_end(search_string)
+        return found
+
+    # version is the version of the book the search started with; a result of an older version is not cached
+    def put(self, search_string, found, version=None):
+        self.check_version()
+        if version is not None and version != self.version:
+            return
+        self.results[search_string] = found
+        self.results.move_to_end(search_string)
+        if len(self.results) > self.size:
+            self.results.popitem(last=False)
+
+    # Returns the smallest cached result of a search string contained in the given one:
+    # every record found by the given search string is part of it
+    def superset(self, search_string):
+        self.check_version()
+        best = None
+        for cached_string, found in self.results.items():
+            if cached_string in search_string and (best is None or len(found) < len(best)):
+                best = found
+        return best
+
+
+# The same as calendar.isleap, the calendar module imports locale and slows down the start
+def is_leap(year):
+    return year % 4 == 0 and (year % 100 != 0 or year % 400 == 0)
+
+
+# Returns the date of the next birthday on or after today.
+# In non-leap years a birthday on February 29 is celebrated on February 28.
+def next_birthday(month, day, today):
+    def in_year(year):
+        if month == 2 and day == 29 and not is_leap(year):
+            return date(year, 2, 28)
+        return date(year, month, day)
+
+    birthday = in_year(today.year)
+    if birthday < today:
+        birthday = in_year(today.year + 1)
+    return birthday
+
+
+class BirthdayIndex:
+    """
+    Calendar of birthdays bucketed by the day of the year.
+
+    There are 366 buckets, one per day of a leap year, so February 29 has a bucket of its own.
+    A query for the next N days reads only the N + 1 buckets of the dates in the window.
+    """
+    DAYS = 366
+    # Day of the year of the first day of every month in a leap year
+    MONTH_STARTS = (0, 0, 31, 60, 91, 121, 152, 182, 213, 244, 274, 305, 335)
+    FEB_29 = 59
+
+    def __init__(self):
+        self.buckets = [set() for _ in range(self.DAYS)]
+        self.positions = {}  # record -> its bucket number
+
+    @classmethod
+    def bucket_of(cls, month, day):
+        return cls.MONTH_STARTS[month] + day - 1
+
+    # Adds a record or moves it to another bucket after a change of the birthday
+    def add(self, record):
+        if not record.birthday:
+            self.remove(record)
+            return
+
+        birthday = record.birthday.birthday
+        position = self.bucket_of(birthday.month, birthday.day)
+        old_position = self.positions.get(record)
+        if old_position == position:
+            return
+        if old_position is not None:
+            self.buckets[old_position].discard(record)
+
+        self.positions[record] = position
+        self.buckets[position].add(record)
+
+    def remove(self, record):
+        position = self.positions.pop(record, None)
+        if position is not None:
+            self.buckets[position].discard(record)
+
+    # Returns the buckets of the dates within the given number of days from today (inclusive),
+    # in the order of the dates
+    @classmethod
+    def window(cls, days, today):
+        positions = []
+        seen = set()
+
+        for offset in range(min(days, cls.DAYS) + 1):
+            current = today + timedelta(days=offset)
+            candidates = [cls.bucket_of(current.month, current.day)]
+            if current.month == 2 and current.day == 28 and not is_leap(current.year):
+                candidates.append(cls.FEB_29)
+
+            for position in candidates:
+                if position not in seen:
+                    seen.add(position)
+                    positions.append(position)
+
+        return positions
+
+    # Returns the records with a birthday within the given number of days from today (inclusive),
+    # ordered by the date of the upcoming birthday
+    def upcoming(self, days, today=None):
+        found = []
+        for position in self.window(days, today or date.today()):
+            found.extend(self.buckets[position])
+        return found
@@ -1,7 +1,23 @@
-import sys
+import os
 import re
-from shutil import unpack_archive, copyfile
-from pathlib import Path
+import json
+import errno
+import gzip
+import tarfile
+import zipfile
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from shutil import copyfile, copyfileobj
+from pathlib import Path, PurePosixPath
+
+try:
+    from xxhash import xxh3_128 as new_hash  # Optional, faster than BLAKE2
+except ImportError:
+    from hashlib import blake2b
+
+    def new_hash():
+        return blake2b(digest_size=16)
 
 
 CYRILLIC_SYMBOLS = "абвгдеёжзийклмнопрстуфхцчшщъыьэюяєіїґ"
@@ -22,68 +38,781 @@ structure = {'Images': ['JPEG', 'PNG', 'JPG', 'SVG', 'TIFF', 'TIF', 'GIF'],
              '3D models': ['3DS', 'STEP', 'STP', 'OBJ', 'FBX', 'IGS', 'MB', 'MAX', 'C4D']
              }
 
-list_name = []
+# Priority for extensions listed in more than one category of structure:
+# the category given here wins, any other extension goes to the first category that lists it.
+PREFERRED_CATEGORIES = {'SVG': 'Images', 'PPTX': 'Presentations'}
 
 
-def copy_file(root, file_path):  # File copying to new directory
+def build_extension_map(structure):  # Reverse map of structure: extension -> category
     
-    if (file_path.suffix[1:]).upper() in structure['Archives']:
-        print(file_path, file_path.name, root)
-        unpack_archive(file_path, create_folder(root, file_path) / normalize(file_path)[:str(file_path.name).rfind('.')])  # Archives without suffix
+    extension_map = {}
+    for category, suffixes in structure.items():
+        for suffix in suffixes:
+            extension_map.setdefault(suffix, category)
+    extension_map.update(PREFERRED_CATEGORIES)
+    return extension_map
+
+
+EXTENSIONS = build_extension_map(structure)
+
+# How files get into 'Sorted':
+#   copy     - the source stays in place;
+#   move     - rename on the same device, a kernel-side copy and removal of the source across devices;
+#   hardlink - a second link to the same data, a copy where links are not supported.
+MODES = ('copy', 'move', 'hardlink')
+
+# Dedup mode: files of equal size are compared by the hash of their first PREFIX_SIZE bytes,
+# the whole content is hashed only for those that still match. Files are read in chunks of HASH_CHUNK_SIZE.
+PREFIX_SIZE = 1 << 16
+HASH_CHUNK_SIZE = 1 << 20
+DUPLICATES_MANIFEST = 'duplicates.json'  # In 'Sorted': stored file -> the skipped copies of it
+
+# Archive members are streamed into their files in chunks of this size
+EXTRACT_CHUNK_SIZE = 1 << 20
+
+JOURNAL = '.journal.jsonl'  # In 'Sorted': the finished operations of the run, see Journal
+FILE_INDEX = '.index.json'  # In 'Sorted': the files sorted by incremental runs, see FileIndex
+PART_SUFFIX = '.part'  # A file is written under name.ext.part and renamed to name.ext when it is complete
+
+class SortCancelled(Exception):
+    pass
+
+
+class NameRegistry:
+    """
+    Destination file names taken during one sorting run, kept per destination folder.
+    A repeated name gets the next free number: name.ext, name(1).ext, name(2).ext ...
+    The files already present in a folder are read once, when the folder is used for the first time.
+    Names are compared case-insensitively, as they are on Windows and macOS file systems.
+    """
+    def __init__(self):
+        self.taken = {}  # folder -> set of lowercased names taken in it
+        self.counters = {}  # (folder, lowercased name) -> next number to try
+
+    def reserve(self, folder, stem, suffix=''):
+        taken = self.taken.get(folder)
+        if taken is None:
+            try:
+                taken = {name.lower() for name in os.listdir(folder)}
+            except FileNotFoundError:
+                taken = set()
+            self.taken[folder] = taken
+
+        key = (folder, f'{stem}{suffix}'.lower())
+        number = self.counters.get(key, 0)
+        while True:
+            name = f'{stem}({number}){suffix}' if number else f'{stem}{suffix}'
+            number += 1
+            if name.lower() not in taken:
+                break
+
+        self.counters[key] = number
+        taken.add(name.lower())
+        return name
+
+
+class Journal:
+    """
+    Journal of a sorting run in Sorted/.journal.jsonl: one JSON line per finished operation, paths relative to the root.
+        {"source": ..., "destination": ...}               a file is sorted
+        {"source": ..., "member": i, "destination": ...}  the i-th member of an archive is extracted
+        {"source": ..., "extracted": n}                   all n members of the archive are extracted
+        {"source": ..., "duplicate_of": ...}              a copy is skipped (dedup mode)
+        {"start": true}                                   the run has started
+        {"complete": true}                                the run has finished
+    Lines are written when the data is in place and flushed at once, so after a crash the journal tells
+    what is done and the next run resumes from there. A dry run keeps the lines in plan instead of writing them.
+    """
+    def __init__(self, filename, dry_run=False):
+        self.filename = filename
+        self.dry_run = dry_run
+        self.file = None
+        self.lock = threading.Lock()
+        self.plan = []  # The entries of a dry run
+        self.unfinished = False  # The journal is continued rather than started anew
+        self.newline = False  # The last line was cut by a crash
+        # Entries of an unfinished run, read by load()
+        self.sorted = {}  # source -> destination
+        self.members = {}  # archive -> {member index: destination}
+        self.extracted = set()
+        self.duplicates = {}  # source -> stored file
+
+    # Reads the journal of an earlier run; returns True if that run was not finished
+    def load(self):
+        try:
+            file = open(self.filename, encoding='utf-8')
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+
+        complete = False
+        with file:
+            for line in file:
+                self.newline = not line.endswith('\n')
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('complete'):
+                    complete = True
+                    self.sorted, self.members, self.extracted, self.duplicates = {}, {}, set(), {}
+                    continue
+                complete = False
+                if entry.get('start'):
+                    continue
+                if 'member' in entry:
+                    self.members.setdefault(entry['source'], {})[entry['member']] = entry['destination']
+                elif 'extracted' in entry:
+                    self.extracted.add(entry['source'])
+                elif 'duplicate_of' in entry:
+                    self.duplicates[entry['source']] = entry['duplicate_of']
+                else:
+                    self.sorted[entry['source']] = entry['destination']
+        self.unfinished = not complete
+        return self.unfinished
+
+    # Creates 'Sorted' with the journal in it before the run creates anything else there,
+    # so a 'Sorted' folder left by a crash always has a journal to resume from
+    def start(self):
+        self.filename.parent.mkdir(exist_ok=True)
+        self.write(start=True)
+
+    def write(self, **entry):
+        line = json.dumps(entry, ensure_ascii=False) + '\n'
+        with self.lock:
+            if self.dry_run:
+                self.plan.append(entry)
+                return
+            if self.file is None:
+                # The journal of a finished (incremental) run is replaced, it would only grow otherwise
+                self.file = open(self.filename, 'a' if self.unfinished else 'w', encoding='utf-8')
+                if self.unfinished and self.newline:
+                    self.file.write('\n')
+            self.file.write(line)
+            self.file.flush()
+
+    def close(self, complete=False):
+        if self.dry_run:
+            return
+        if complete and (self.file is not None or self.filename.parent.is_dir()):
+            self.write(complete=True)
+        with self.lock:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+
+
+class FileIndex:
+    """
+    State of the files sorted by incremental runs, in Sorted/.index.json:
+    path relative to the root -> [size, modification time in ns, inode, destination relative to the root].
+    A file with the same size, mtime and inode is not sorted again. The state is taken with a stat call,
+    the content of the files is never read. Files that are gone are dropped when the index is saved.
+    """
+    def __init__(self, filename):
+        self.filename = filename
+        self.files = {}  # Saved by the earlier run
+        self.seen = {}  # Files found by this run
+        self.unchanged = 0
+        self.loaded = False
+
+    def load(self):
+        try:
+            with open(self.filename, 'rb') as file:
+                self.files = json.load(file)
+        except (FileNotFoundError, NotADirectoryError):
+            return False
+        self.loaded = True
+        return True
+
+    # Returns the size of a new or changed file, None if it is the same as when it was sorted
+    def check(self, source, entry):
+        stat = entry.stat()
+        state = [stat.st_size, stat.st_mtime_ns, entry.inode()]
+        previous = self.files.get(source)
+        if previous is not None and previous[:3] == state:
+            self.seen[source] = previous
+            self.unchanged += 1
+            return None
+        self.seen[source] = state + [None]
+        return stat.st_size
+
+    # Destination of the file in the earlier run, if it is still there
+    def previous_destination(self, source, root):
+        previous = self.files.get(source)
+        if previous is not None and previous[3] and (root / previous[3]).is_file():
+            return root / previous[3]
+        return None
+
+    def sorted_to(self, source, destination):
+        self.seen[source][3] = destination
+
+    def save(self):
+        partial = self.filename.with_name(self.filename.name + PART_SUFFIX)
+        with open(partial, 'w', encoding='utf-8') as file:
+            json.dump(self.seen, file, ensure_ascii=False, separators=(',', ':'))
+        os.replace(partial, self.filename)
+
+
+class SortRun:
+    """
+    State and progress of one sorting run.
+    The run can be executed in a background thread with start(); its counters can be read from any other thread,
+    cancel() stops the run before the next file.
+
+    With workers > 1 the directory scan and the choice of destination names stay in the scanning thread,
+    so the names do not depend on timing, while copying and archive extraction run in a pool of worker threads.
+    The files of an archive are sorted into the categories like any other file. The scanning thread
+    reads only the list of the members of a zip; a tar has no such list, so the worker extracting it
+    chooses the names of its members as the stream reaches them.
+
+    With dedup=True byte-identical files are stored once: the first one found is sorted, the other copies
+    are skipped (removed in the move mode) and listed in Sorted/duplicates.json. Archives are not compared:
+    they are extracted, so there is no stored copy of an archive a skipped one could point to.
+
+    Finished operations are written to the Journal. A run that finds the journal of an unfinished run
+    in 'Sorted' resumes it: the files sorted before are skipped. With dry_run=True nothing is changed
+    on disk, the operations are collected in journal.plan.
+
+    With incremental=True the run keeps a FileIndex and may run again over the same folder:
+    only the files that are new or changed since the last run are sorted, a changed file replaces its earlier copy.
+    """
+    def __init__(self, root, workers=1, mode='copy', dedup=False, dry_run=False, incremental=False):
+        if mode not in MODES:
+            raise ValueError(f"Unknown sorting mode: {mode}")
+        self.root = Path(root)
+        self.workers = workers
+        self.mode = mode
+        self.dedup = dedup
+        self.dry_run = dry_run
+        self.files = 0  # Number of processed files
+        self.bytes = 0  # Size of processed files
+        self.duplicates = 0  # Number of skipped copies (dedup mode)
+        self.duplicate_bytes = 0  # Size of skipped copies
+        self.resumed = 0  # Number of files sorted by the interrupted run
+        self.current = None  # File being processed
+        self.error = None
+        self.finished = False
+        self.cancelled = threading.Event()
+        self.thread = None
+        self.lock = threading.Lock()
+        self.pool = None
+        # Limits the number of files queued for the workers, so the scan does not run far ahead of them
+        self.queue_slots = threading.BoundedSemaphore(workers * 4)
+        self.empty_folders = []
+        self.names = NameRegistry()
+        self.folders = {}  # extension -> destination folder, created on the first use
+        self.names_lock = threading.Lock()  # Guards names and folders, the workers extracting a tar use them too
+        self.journal = Journal(self.root / 'Sorted' / JOURNAL, dry_run)
+        self.resume = False  # Continues an interrupted run
+        self.own_sorted = False  # 'Sorted' holds the work of this run (or of the run it continues)
+        self.file_index = FileIndex(self.root / 'Sorted' / FILE_INDEX) if incremental else None
+
+    def run(self):
+        try:
+            self.resume = self.journal.load()
+            if self.file_index is not None:
+                self.file_index.load()
+            # The 'Sorted' folder is left out of the scan when this run continues the work done in it
+            self.own_sorted = self.resume or (self.file_index is not None and self.file_index.loaded)
+            if not self.dry_run:
+                if not self.own_sorted:
+                    scan_folder(self.root)  # Refuse an existing 'Sorted' before creating one
+                self.journal.start()
+                self.own_sorted = True
+            if self.resume and not self.dry_run:
+                remove_partial_files(self.root / 'Sorted')
+
+            if self.workers > 1:
+                with ThreadPoolExecutor(self.workers, thread_name_prefix="sorter-worker") as self.pool:
+                    try:
+                        parse_folder(self, self.root)
+                    except BaseException:
+                        self.cancel()
+                        raise
+            else:
+                parse_folder(self, self.root)
+
+            # A failed worker stops the scan through cancel(), report its error rather than the cancellation
+            if self.error:
+                raise self.error
+            if not self.dry_run:
+                remove_empty_folders(self)
+                if self.file_index is not None and (self.root / 'Sorted').is_dir():
+                    self.file_index.save()
+            self.journal.close(complete=True)
+        except Exception as error:
+            self.error = self.error or error
+        finally:
+            self.journal.close()
+            self.current = None
+            self.finished = True
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="sorter", daemon=True)
+        self.thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check_cancelled(self):
+        if self.cancelled.is_set():
+            raise SortCancelled
+
+    # Runs function in a worker thread, or right away when the run has no pool.
+    # A dry run only plans, in the order of the scan.
+    def submit(self, function, *args):
+        if self.pool is None or self.dry_run:
+            function(*args)
+            return
+
+        self.queue_slots.acquire()
+        try:
+            future = self.pool.submit(function, *args)
+        except BaseException:
+            self.queue_slots.release()
+            raise
+        future.add_done_callback(self.task_done)
+
+    # Results of function for every item, computed by the workers when the run has a pool
+    def map(self, function, items):
+        if self.pool is None:
+            return [function(item) for item in items]
+        return list(self.pool.map(function, items))
+
+    def task_done(self, future):
+        self.queue_slots.release()
+        error = future.exception()
+        if error is not None:
+            with self.lock:
+                if self.error is None:
+                    self.error = error
+            self.cancel()
+
+    # Path relative to the root, as written to the journal
+    def relative(self, path):
+        return path.relative_to(self.root).as_posix()
+
+    def add_progress(self, size):
+        with self.lock:
+            self.files += 1
+            self.bytes += size
+
+    # Human readable result of the finished run
+    def message(self):
+        if isinstance(self.error, SortCancelled):
+            return f"Sorting was cancelled after {self.files} files"
+        if isinstance(self.error, FileNotFoundError):
+            return "Directory does not exist. Try again"
+        if isinstance(self.error, FileExistsError):
+            return "Folder 'Sorted' already exist. Sorting was not complete"
+        if self.error:
+            return f"Sorting failed: {self.error}"
+        if self.dry_run:
+            return f"Dry run: {len(self.journal.plan)} operations planned, nothing was changed"
+        message = f"Folder 'Sorted' was created\nSorting in the directory {self.root} has been completed successfully."
+        if self.duplicates:
+            message += f"\nDuplicates skipped: {self.duplicates} ({self.duplicate_bytes / 2 ** 20:.1f} MB)"
+        if self.resumed:
+            message += f"\nResumed: {self.resumed} files had been sorted by the interrupted run"
+        if self.file_index is not None and self.file_index.unchanged:
+            message += f"\nUnchanged files skipped: {self.file_index.unchanged}"
+        return message
+
+
+def copy_file(run, file_path, size=None):  # Choose the destination of the file and copy it there (in a worker when parallel)
+    
+    run.check_cancelled()
+    source = run.relative(file_path)
+    if source in run.journal.sorted or source in run.journal.extracted:  # Done by the interrupted run
+        run.resumed += 1
+        destination = run.root / run.journal.sorted.get(source, source)
+        if run.file_index is not None and source in run.journal.sorted:
+            run.file_index.sorted_to(source, run.journal.sorted[source])
+        return destination
+
+    if is_archive(file_path):
+        archive = list_members(file_path)
+        if archive is not None:
+            kind, names = archive
+            done = run.journal.members.get(source, {})
+            # None for the members extracted by the interrupted run; the destinations of tar members
+            # are chosen by extract_archive
+            destinations = None if names is None else [None if index in done else
+                                                       reserve_destination(run, member_path(name))
+                                                       for index, name in enumerate(names)]
+            run.submit(extract_archive, run, file_path, kind, destinations, size)
+            return file_path
+        # An archive that can not be read is sorted as a plain file
+
+    destination = None
+    if run.file_index is not None:
+        # A changed file replaces its copy sorted by the earlier run
+        destination = run.file_index.previous_destination(source, run.root)
+    if destination is None:
+        destination = reserve_destination(run, file_path)
+    if run.file_index is not None:
+        run.file_index.sorted_to(source, run.relative(destination))
+    run.submit(transfer_file, run, file_path, destination, size)
+    return destination
+
+
+def reserve_destination(run, file_path):  # Destination of a file (or an archive member) in 'Sorted'
+    
+    with run.names_lock:
+        folder = create_folder(run, file_path)
+        return folder / run.names.reserve(str(folder), normalize(file_path), file_path.suffix)
+
+
+def member_path(name):  # Path of an archive member by its file name alone, the folders in the archive are dropped
+    
+    return Path(PurePosixPath(name.replace('\\', '/')).name)
+
+
+def transfer_file(run, file_path, destination, size=None):  # File copying (moving, linking) to new directory
+    
+    if run.cancelled.is_set():
+        return
+    if run.dry_run:
+        run.journal.write(source=run.relative(file_path), destination=run.relative(destination))
+        run.add_progress(size or 0)
+        return
+    run.current = file_path
+    if size is None:
+        size = file_path.stat().st_size
+    if run.mode == 'move':
+        move_file(file_path, destination)
+    elif run.mode == 'hardlink':
+        link_file(file_path, destination)
     else:
-        copyfile(file_path, create_folder(root, file_path) / normalize(file_path))
+        copy_complete(file_path, destination)
+    run.journal.write(source=run.relative(file_path), destination=run.relative(destination))
+    run.add_progress(size)
 
 
-def create_folder(root, file_path):  # Create folder using file-format as folder name
+def list_members(file_path):  # (kind, names of the member files in the order of extraction), None if unreadable
     
-    new_directory = Path(fr'{root}/Sorted/{create_volume(file_path) or "Other"}/{(file_path.suffix[1:]).upper()}')
-    new_directory.mkdir(parents=True, exist_ok=True)
+    try:
+        if file_path.suffix.upper() == '.ZIP':
+            with zipfile.ZipFile(file_path) as archive:
+                return 'zip', [info.filename for info in archive.infolist() if not info.is_dir()]
+        # Only the first header is read: listing a tar means reading through all of it,
+        # its members are listed by extract_archive as it reads them anyway
+        if tarfile.is_tarfile(file_path):  # .tar, and .gz that is a compressed tar
+            return 'tar', None
+        if file_path.suffix.upper() == '.GZ':  # A single compressed file: name.ext.gz holds name.ext
+            return 'gzip', [file_path.stem]
+    except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError):
+        pass
+    return None
+
+
+def extract_archive(run, file_path, kind, destinations, size=None):  # Stream the members into their folders
+    
+    if run.cancelled.is_set():
+        return
+    archive_name = run.relative(file_path)
+    done = run.journal.members.get(archive_name, {})  # Members extracted by the interrupted run
+
+    def extracted(index, destination):
+        run.journal.write(source=archive_name, member=index, destination=run.relative(destination))
+
+    if run.dry_run:
+        if kind == 'tar':
+            with tarfile.open(file_path, 'r|*') as archive:
+                destinations = [destination for _, destination in tar_members(run, archive, done)]
+        for index, destination in enumerate(destinations):
+            if destination is not None:
+                extracted(index, destination)
+        run.journal.write(source=archive_name, extracted=len(destinations))
+        run.add_progress(size or 0)
+        return
+
+    run.current = file_path
+    if size is None:
+        size = file_path.stat().st_size
+
+    if kind == 'zip':
+        with zipfile.ZipFile(file_path) as archive:
+            members = (info for info in archive.infolist() if not info.is_dir())
+            for index, (info, destination) in enumerate(zip(members, destinations)):
+                run.check_cancelled()
+                if destination is not None:
+                    with archive.open(info) as source:
+                        write_member(source, destination)
+                    extracted(index, destination)
+    elif kind == 'tar':
+        # A stream reads the archive once from start to end, each member is extracted as it comes
+        destinations = []
+        with tarfile.open(file_path, 'r|*') as archive:
+            for index, (member, destination) in enumerate(tar_members(run, archive, done)):
+                run.check_cancelled()
+                destinations.append(destination)
+                if destination is not None:
+                    write_member(archive.extractfile(member), destination)
+                    extracted(index, destination)
+    elif destinations[0] is not None:
+        with gzip.open(file_path, 'rb') as source:
+            write_member(source, destinations[0])
+        extracted(0, destinations[0])
+
+    run.journal.write(source=archive_name, extracted=len(destinations))
+    if run.mode == 'move':
+        file_path.unlink()
+    run.add_progress(size)
+
+
+def tar_members(run, archive, done):  # (member, destination) of the files of a tar stream, None for the done ones
+    
+    for index, member in enumerate(member for member in archive if member.isfile()):
+        yield member, None if index in done else reserve_destination(run, member_path(member.name))
+
+
+def write_member(source, destination):
+    
+    partial = part_path(destination)
+    with open(partial, 'wb') as target:
+        copyfileobj(source, target, EXTRACT_CHUNK_SIZE)
+    os.replace(partial, destination)
+
+
+def part_path(destination):  # Temporary name of a file being written
+    
+    return destination.with_name(destination.name + PART_SUFFIX)
+
+
+def copy_complete(source, destination):  # Copy under the temporary name, so a crash never leaves a cut file
+    
+    partial = part_path(destination)
+    fast_copy(source, partial)
+    os.replace(partial, destination)
+
+
+def remove_partial_files(folder):  # Files left unfinished by an interrupted run
+    
+    for path, _, names in os.walk(folder):
+        for name in names:
+            if name.endswith(PART_SUFFIX):
+                os.unlink(os.path.join(path, name))
+
+
+def move_file(source, destination):  # Rename within a device, copy and delete across devices
+    
+    try:
+        os.rename(source, destination)
+    except OSError as error:
+        if error.errno != errno.EXDEV:
+            raise
+        copy_complete(source, destination)
+        os.unlink(source)
+
+
+def link_file(source, destination):  # Hard link, or a copy where the file system can not link
+    
+    partial = part_path(destination)
+    try:
+        os.link(source, partial)
+    except OSError:
+        copy_complete(source, destination)
+    else:
+        os.replace(partial, destination)  # Replaces the earlier copy of a changed file in the incremental mode
+        if os.path.lexists(partial):  # Nothing is renamed when both names already link to the same file
+            os.unlink(partial)
+
+
+def fast_copy(source, destination):  # Copy the data inside the kernel where possible
+    
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is None:
+        copyfile(source, destination)  # Uses sendfile/fcopyfile/CopyFile2 of the platform
+        return
+
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        try:
+            # copy_file_range also lets copy-on-write file systems share the blocks instead of copying them
+            while copy_file_range(src.fileno(), dst.fileno(), 1 << 30):
+                pass
+            return
+        except OSError as error:
+            # Not supported by the kernel or between these file systems, nothing was copied yet
+            if error.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF) or dst.tell():
+                raise
+    copyfile(source, destination)
+
+
+def create_folder(run, file_path):  # Create folder using file-format as folder name
+    
+    extension = (file_path.suffix[1:]).upper()
+    new_directory = run.folders.get(extension)
+    if new_directory is None:
+        new_directory = run.root / 'Sorted' / (create_volume(file_path) or 'Other') / extension
+        if not run.dry_run:
+            new_directory.mkdir(parents=True, exist_ok=True)
+        run.folders[extension] = new_directory
     return new_directory
 
 
 def create_volume(file_path): # Find file-format in Dictionary and return Key as a folder name
     
-    for key, value in structure.items():
-        for suffix in value:
-            if (file_path.suffix[1:]).upper() == suffix:
-                return key
+    return EXTENSIONS.get((file_path.suffix[1:]).upper())
 
 
-def normalize(file_path): # Normalize filename
+def is_archive(file_path):
     
-    name = file_path.name[:str(file_path.name).rfind('.')] # Filename without suffix
-    new_name = re.sub(r'\W', '_', name.translate(TRANS))  # New filename - transliterated
-    file_name = f'{new_name}{file_path.suffix}'  # New filename with suffix
-    new_name = is_duplicate(file_name, new_name) or new_name # New filename or New filename with extra number if more than one exists
-    return f'{new_name}{file_path.suffix}'
+    return create_volume(file_path) == 'Archives'
 
 
-def is_duplicate(file_name, new_name):
+def normalize(file_path): # Normalize filename, returns the new filename without suffix
     
-    list_name.append(file_name)  # Add to global list with filenames
-    if list_name.count(file_name) > 1:
-        # Add NUMBER to filename if filename already exist
-        new_name = f'{new_name}({list_name.count(file_name) - 1})'
-        return new_name
+    name = file_path.name[:len(file_path.name) - len(file_path.suffix)] # Filename without suffix
+    return re.sub(r'\W', '_', name.translate(TRANS))  # New filename - transliterated
 
 
-def parse_folder(root, path):  # Iter in the directory
+def scan_folder(path, own=None):  # Entries of one directory, read with a single scandir
     
-    for element in path.iterdir():
-        if element.name.lower() == 'sorted':
+    with os.scandir(path) as entries:
+        entries = list(entries)
+    if own is not None:
+        entries = [entry for entry in entries if entry.name != own]  # The 'Sorted' folder of a resumed run
+    for entry in entries:
+        if entry.name.lower() == 'sorted':
             raise FileExistsError
-    for element in path.iterdir():
-        if element.is_dir():
-            parse_folder(root, element)  # Recursion
-            if element.name in structure.keys():
+    return entries
+
+
+def walk_files(run, path):  # Yields the files of the tree as DirEntry objects, depth first, without recursion
+    
+    # Every directory is read once; the type of an entry comes from the directory listing, without a stat call.
+    # A stack of iterators over the listed entries gives the same order as a recursive walk.
+    stack = [iter(scan_folder(path, 'Sorted' if run.own_sorted else None))]
+    while stack:
+        entry = next(stack[-1], None)
+        if entry is None:
+            stack.pop()
+            continue
+        if entry.is_dir():
+            stack.append(iter(scan_folder(entry.path)))
+            if entry.name not in structure:
+                run.empty_folders.append(Path(entry.path))
+        else:
+            yield entry
+
+
+def parse_folder(run, path):  # Sort the files of the directory tree as the walk finds them
+    
+    if run.dedup:
+        parse_folder_unique(run, path)
+        return
+    for file_path, size in changed_files(run, path):
+        copy_file(run, file_path, size)
+
+
+def changed_files(run, path):  # (path, size) of the files to sort; in the incremental mode the new and changed ones
+    
+    for entry in walk_files(run, path):
+        file_path = Path(entry.path)
+        if run.file_index is not None:
+            size = run.file_index.check(run.relative(file_path), entry)
+            if size is None:
                 continue
-            else:
-                try:
-                    element.rmdir()  # Delete empty folder
-                except:
-                    pass
+        # On Windows the size comes with the directory listing, elsewhere it would cost a stat in this thread
+        elif os.name == 'nt' or run.dedup:
+            size = entry.stat().st_size
         else:
-            copy_file(root, element)
+            size = None
+        yield file_path, size
+
+
+def parse_folder_unique(run, path):  # Dedup mode: sort the first copy of every file, skip the others
+    
+    # Copies can be anywhere in the tree, so the whole tree is scanned before the first file is sorted
+    files = list(changed_files(run, path))
+    copies = find_duplicates(run, files)
+    originals = set(copies.values())
+
+    destinations = {}
+    skipped = {}  # stored file -> copies of it, relative to the root
+    for source, stored in run.journal.duplicates.items():  # Skipped by the interrupted run
+        skipped.setdefault(stored, []).append(source)
+    for index, (file_path, size) in enumerate(files):
+        original = copies.get(index)
+        if original is None:
+            destination = copy_file(run, file_path, size)
+            if index in originals:
+                destinations[index] = destination
+            continue
+
+        run.check_cancelled()
+        source = run.relative(file_path)
+        if source in run.journal.duplicates:
+            continue
+        stored = run.relative(destinations[original])
+        skipped.setdefault(stored, []).append(source)
+        if run.mode == 'move' and not run.dry_run:
+            file_path.unlink()  # The content is kept by the stored copy
+        run.journal.write(source=source, duplicate_of=stored)
+        with run.lock:
+            run.duplicates += 1
+            run.duplicate_bytes += size
+
+    if skipped and not run.dry_run:
+        with open(run.root / 'Sorted' / DUPLICATES_MANIFEST, 'w', encoding='utf-8') as file:
+            json.dump(skipped, file, indent=3, ensure_ascii=False)
+
+
+def find_duplicates(run, files):  # Returns {index of a copy: index of the first file with the same content}
+    
+    by_size = {}
+    for index, (file_path, size) in enumerate(files):
+        if not is_archive(file_path):
+            by_size.setdefault(size, []).append(index)
+    groups = [group for group in by_size.values() if len(group) > 1]  # A file of a unique size has no copies
+
+    groups = group_by_digest(run, files, groups, PREFIX_SIZE)
+    # Files not longer than the prefix have been compared as a whole already
+    whole = [group for group in groups if files[group[0]][1] <= PREFIX_SIZE]
+    groups = whole + group_by_digest(run, files, [group for group in groups if files[group[0]][1] > PREFIX_SIZE])
+    return {index: group[0] for group in groups for index in group[1:]}
+
+
+def group_by_digest(run, files, groups, limit=None):  # Splits groups of file indexes by the hash of their content
+    
+    indexes = [index for group in groups for index in group]
+
+    def digest(index):
+        run.check_cancelled()
+        return file_digest(files[index][0], limit)
+
+    digests = dict(zip(indexes, run.map(digest, indexes)))
+    result = []
+    for group in groups:
+        by_digest = {}
+        for index in group:
+            by_digest.setdefault(digests[index], []).append(index)
+        result.extend(same for same in by_digest.values() if len(same) > 1)
+    return result
+
+
+def file_digest(file_path, limit=None):  # Hash of the file content, of its first limit bytes if given
+    
+    digest = new_hash()
+    with open(file_path, 'rb') as file:
+        if limit is not None:
+            digest.update(file.read(limit))
+        else:
+            while chunk := file.read(HASH_CHUNK_SIZE):
+                digest.update(chunk)
+    return digest.digest()
+
+
+def remove_empty_folders(run):  # Runs after all files are processed
+    
+    # The folders were found parents first, remove the children first
+    for folder in reversed(run.empty_folders):
+        try:
+            folder.rmdir()  # Delete empty folder
+        except OSError:
+            pass
 
 
 for c, l in zip(CYRILLIC_SYMBOLS, TRANSLATION):
@@ -91,21 +820,33 @@ for c, l in zip(CYRILLIC_SYMBOLS, TRANSLATION):
     TRANS[ord(c.upper())] = l.upper()
 
 
-def main(input_text):
+def main(input_text, workers=1, mode='copy', dedup=False, incremental=False):
     path = Path(input_text.split()[1].lower())
-    root = path
-    try:
-        parse_folder(root, path)
-    except FileNotFoundError:
-        print("\nDirectory does not exist. Try again\n")
-    except FileExistsError:
-        print("\nFolder 'Sorted' already exist. Sorting was not complete\n")
-    else:
-        print(f"\nFolder 'Sorted' was created\nSorting in the directory {root} has been completed successfully.\n")
+    run = SortRun(path, workers=workers, mode=mode, dedup=dedup, incremental=incremental)
+    run.run()
+    print(f"\n{run.message()}\n")
 
 
 if __name__ == '__main__':
-    path = Path(sys.argv[1])
-    root = path
-    parse_folder(root, path)
-    print(path, '  Done')
+    parser = argparse.ArgumentParser(description="Sort files in a folder by category into its 'Sorted' subfolder")
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--workers", type=int, default=1, help="number of threads copying files (default: 1)")
+    parser.add_argument("--mode", choices=MODES, default='copy', help="copy, move or hardlink files (default: copy)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="store byte-identical files once, list the copies in Sorted/duplicates.json")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="print the planned operations as JSON lines, change nothing")
+    parser.add_argument("--incremental", action="store_true",
+                        help="sort only the files that are new or changed since the last incremental run")
+    args = parser.parse_args()
+
+    run = SortRun(args.path, workers=args.workers, mode=args.mode, dedup=args.dedup, dry_run=args.dry_run,
+                  incremental=args.incremental)
+    run.run()
+    if run.error:
+        raise run.error
+    if args.dry_run:
+        for entry in run.journal.plan:
+            print(json.dumps(entry, ensure_ascii=False))
+    else:
+        print(args.path, '  Done')
@@ -0,0 +1,317 @@
+import json
+import sqlite3
+import argparse
+from collections.abc import MutableMapping
+from datetime import date
+from weakref import WeakValueDictionary
+
+from indexes import NGramIndex, BirthdayIndex, normalize_phone, normalize_email
+
+
+# The FTS5 tokenizer stops at a NUL character, so the fields of the searchable text are separated by another one
+SEPARATOR = "\x1f"
+# Shortest search string the trigram index can answer; shorter ones scan the whole table
+MIN_MATCH = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    phones TEXT NOT NULL,       -- JSON list, as in address_book.json
+    emails TEXT NOT NULL,       -- JSON list, as in address_book.json
+    address TEXT NOT NULL,
+    birthday TEXT NOT NULL,
+    birthday_day INTEGER,       -- day of the year (see BirthdayIndex.bucket_of), NULL without a birthday
+    notes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_birthday_day ON contacts (birthday_day);
+
+-- phones and emails hold the normalized values (see indexes.normalize_phone and normalize_email)
+CREATE TABLE IF NOT EXISTS phones (
+    phone TEXT NOT NULL,
+    contact_id INTEGER NOT NULL,
+    PRIMARY KEY (phone, contact_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS phones_contact_id ON phones (contact_id);
+
+CREATE TABLE IF NOT EXISTS emails (
+    email TEXT NOT NULL,
+    contact_id INTEGER NOT NULL,
+    PRIMARY KEY (email, contact_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS emails_contact_id ON emails (contact_id);
+
+-- rowid is the id of the contact; text holds the fields searched by find_data_in_book, all columns are lowercased
+CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5 (text, address, notes, tokenize = 'trigram');
+"""
+
+COLUMNS = "c.name, c.phones, c.emails, c.address, c.birthday, c.notes"
+
+
+def row_to_dict(row):
+    name, phones, emails, address, birthday, notes = row
+    return {
+        "name": name,
+        "phones": json.loads(phones),
+        "emails": json.loads(emails),
+        "address": address,
+        "birthday": birthday,
+        "notes": notes,
+    }
+
+
+class SQLiteStorage:
+    """
+    SQLite storage backend for the address book.
+
+    The records stay in the database and are built only when they are accessed, so the working set
+    of a book does not depend on its size. Names, phones, emails and the day of the birthday are indexed,
+    the searchable fields, addresses and notes are indexed by an FTS5 trigram table for substring search.
+
+    Changes are written through to the database as they are made, inside a transaction that is committed
+    by append() (i.e. by AddressBook.save), so queries always see the current state of the book
+    and an unsaved change is lost on a crash, as with the JSON storage.
+    """
+    queryable = True
+
+    def __init__(self, filename):
+        self.filename = filename
+        # The book may be opened in one thread (e.g. the loader of the GUI) and used in another one
+        self.connection = sqlite3.connect(filename, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.count_cache = None
+
+    # The records are not loaded, they are read from the database on access
+    def load(self):
+        return iter(())
+
+    # The changes are already written, saving commits them
+    def append(self, changes):
+        self.connection.commit()
+
+    # The database always holds the whole book
+    def write_snapshot(self, records_data):
+        self.connection.commit()
+
+    def close(self):
+        self.connection.commit()
+        self.connection.close()
+
+    def records(self, materialize):
+        return SQLiteRecords(self, materialize)
+
+    # Writes a record, replacing the one with the same name
+    def put(self, record):
+        data = record.to_dict()
+        if record.birthday:
+            birthday = record.birthday.birthday
+            birthday_day = BirthdayIndex.bucket_of(birthday.month, birthday.day)
+        else:
+            birthday_day = None
+        values = (json.dumps(data["phones"]), json.dumps(data["emails"]), data["address"],
+                  data["birthday"], birthday_day, data["notes"])
+
+        execute = self.connection.execute
+        row = execute("SELECT id FROM contacts WHERE name = ?", (data["name"],)).fetchone()
+        if row is None:
+            contact_id = execute(
+                "INSERT INTO contacts (name, phones, emails, address, birthday, birthday_day, notes) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)", (data["name"], *values)
+            ).lastrowid
+            self.count_cache = None
+        else:
+            contact_id = row[0]
+            execute(
+                "UPDATE contacts SET phones = ?, emails = ?, address = ?, birthday = ?, birthday_day = ?, notes = ? "
+                "WHERE id = ?", (*values, contact_id)
+            )
+            self.delete_children(contact_id)
+
+        self.connection.executemany("INSERT OR IGNORE INTO phones (phone, contact_id) VALUES (?, ?)",
+                                    [(normalize_phone(phone), contact_id) for phone in data["phones"]])
+        self.connection.executemany("INSERT OR IGNORE INTO emails (email, contact_id) VALUES (?, ?)",
+                                    [(normalize_email(email), contact_id) for email in data["emails"]])
+        text = NGramIndex.searchable_text(record).replace(NGramIndex.SEPARATOR, SEPARATOR)
+        execute("INSERT INTO contacts_fts (rowid, text, address, notes) VALUES (?, ?, ?, ?)",
+                (contact_id, text, data["address"].lower(), data["notes"].lower()))
+
+    # Deletes a record by name, returns False if there is no such record
+    def delete(self, name):
+        row = self.connection.execute("SELECT id FROM contacts WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return False
+        self.connection.execute("DELETE FROM contacts WHERE id = ?", row)
+        self.delete_children(row[0])
+        self.count_cache = None
+        return True
+
+    def delete_children(self, contact_id):
+        for table in ("phones", "emails", "contacts_fts"):
+            column = "rowid" if table == "contacts_fts" else "contact_id"
+            self.connection.execute(f"DELETE FROM {table} WHERE {column} = ?", (contact_id,))
+
+    # Returns the dictionary representation of a record, None if there is no such record
+    def get(self, name):
+        row = self.connection.execute(f"SELECT {COLUMNS} FROM contacts c WHERE c.name = ?", (name,)).fetchone()
+        return row_to_dict(row) if row is not None else None
+
+    def contains(self, name):
+        return self.connection.execute("SELECT 1 FROM contacts WHERE name = ?", (name,)).fetchone() is not None
+
+    def count(self):
+        if self.count_cache is None:
+            self.count_cache = self.connection.execute("SELECT count(*) FROM contacts").fetchone()[0]
+        return self.count_cache
+
+    # Yields the names of all records in batches, so a change of the book during the iteration is safe
+    def names(self, batch=1000):
+        last = ""
+        while True:
+            names = [row[0] for row in self.connection.execute(
+                "SELECT name FROM contacts WHERE name > ? ORDER BY name LIMIT ?", (last, batch))]
+            yield from names
+            if len(names) < batch:
+                return
+            last = names[-1]
+
+    # Yields (name, record dictionary) pairs of all records in batches
+    def record_dicts(self, batch=1000):
+        last = ""
+        while True:
+            rows = self.connection.execute(
+                f"SELECT {COLUMNS} FROM contacts c WHERE c.name > ? ORDER BY c.name LIMIT ?", (last, batch)
+            ).fetchall()
+            for row in rows:
+                yield row[0], row_to_dict(row)
+            if len(rows) < batch:
+                return
+            last = rows[-1][0]
+
+    # Returns the dictionaries of the records whose searchable fields (or notes) contain the search string
+    def search(self, search_string, column="text"):
+        search_string = search_string.lower()
+        if len(search_string) >= MIN_MATCH:
+            # The trigram index finds the candidates, instr keeps the exact matches only
+            query = (f"SELECT {COLUMNS} FROM contacts_fts f JOIN contacts c ON c.id = f.rowid "
+                     f"WHERE f.{column} MATCH ? AND instr(f.{column}, ?)")
+            params = ('"' + search_string.replace('"', '""') + '"', search_string)
+        else:
+            query = (f"SELECT {COLUMNS} FROM contacts_fts f JOIN contacts c ON c.id = f.rowid "
+                     f"WHERE instr(f.{column}, ?)")
+            params = (search_string,)
+        return [row_to_dict(row) for row in self.connection.execute(query, params)]
+
+    # Returns the dictionaries of the records with a birthday within the given number of days from today
+    # (inclusive), ordered by the date of the upcoming birthday
+    def upcoming_birthdays(self, days, today=None):
+        positions = BirthdayIndex.window(days, today or date.today())
+        order = {position: number for number, position in enumerate(positions)}
+        rows = self.connection.execute(
+            f"SELECT c.birthday_day, {COLUMNS} FROM contacts c "
+            f"WHERE c.birthday_day IN ({', '.join('?' * len(positions))})", positions
+        ).fetchall()
+        rows.sort(key=lambda row: order[row[0]])
+        return [row_to_dict(row[1:]) for row in rows]
+
+    # Returns the dictionaries of the records with the phone number
+    def find_phone(self, phone):
+        return [row_to_dict(row) for row in self.connection.execute(
+            f"SELECT {COLUMNS} FROM phones p JOIN contacts c ON c.id = p.contact_id WHERE p.phone = ?",
+            (normalize_phone(phone),))]
+
+    # Returns the dictionaries of the records with the email address
+    def find_email(self, email):
+        return [row_to_dict(row) for row in self.connection.execute(
+            f"SELECT {COLUMNS} FROM emails e JOIN contacts c ON c.id = e.contact_id WHERE e.email = ?",
+            (normalize_email(email),))]
+
+
+class SQLiteRecords(MutableMapping):
+    """
+    Records of a book kept in a SQLiteStorage, used as AddressBook.data.
+    Setting and deleting a record writes it to the database. A record is built from its row when it is accessed
+    and is kept only while it is in use somewhere, so a record changed through any reference is the same object.
+    """
+    def __init__(self, storage, materialize):
+        self.storage = storage
+        self.materialize = materialize
+        self.loaded = WeakValueDictionary()  # name -> record built from the database
+
+    # Returns the record of a dictionary read from the database, building it if it is not loaded yet
+    def record(self, data):
+        record = self.loaded.get(data["name"])
+        if record is None:
+            record = self.materialize(data)
+            self.loaded[data["name"]] = record
+        return record
+
+    def __getitem__(self, name):
+        record = self.loaded.get(name)
+        if record is None:
+            data = self.storage.get(name)
+            if data is None:
+                raise KeyError(name)
+            record = self.record(data)
+        return record
+
+    def __setitem__(self, name, record):
+        self.storage.put(record)
+        self.loaded[name] = record
+
+    def __delitem__(self, name):
+        if not self.storage.delete(name):
+            raise KeyError(name)
+        self.loaded.pop(name, None)
+
+    def __contains__(self, name):
+        return self.storage.contains(name)
+
+    def __iter__(self):
+        return self.storage.names()
+
+    def __len__(self):
+        return self.storage.count()
+
+    def record_dicts(self):
+        return self.storage.record_dicts()
+
+    def search(self, search_string):
+        return [self.record(data) for data in self.storage.search(search_string)]
+
+    def upcoming_birthdays(self, days):
+        return [self.record(data) for data in self.storage.upcoming_birthdays(days)]
+
+    def find_phone(self, phone):
+        return [self.record(data) for data in self.storage.find_phone(phone)]
+
+    def find_email(self, email):
+        return [self.record(data) for data in self.storage.find_email(email)]
+
+
+def import_json(json_filename, db_filename):
+    """
+    Copies an address book from the JSON format (the snapshot and its journal) into a SQLite database.
+    Returns the number of records in the database.
+    """
+    from classAddressBook import AddressBook
+    from storage import JournalStorage
+
+    source = JournalStorage(json_filename)
+    book = AddressBook(db_filename)
+    book.load_records(source.load())
+    book.save()
+    count = len(book)
+    book.close()
+    source.close()
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import an address book from JSON into a SQLite database")
+    parser.add_argument("json_file", nargs="?", default="address_book.json")
+    parser.add_argument("db_file", nargs="?", default="address_book.db")
+    args = parser.parse_args()
+
+    print(f"{import_json(args.json_file, args.db_file)} records in {args.db_file}")
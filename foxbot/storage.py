@@ -0,0 +1,246 @@
+import os
+import json
+import threading
+
+from codec import iter_book, load_book, write_book
+
+
+def fsync_directory(path):
+    """
+    Flushes a directory entry to disk so that a rename inside it survives a crash.
+    Not supported on Windows, where it is silently skipped.
+    """
+    try:
+        fd = os.open(path or ".", os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write_book(filename, records_data, tmp_name=None):
+    """
+    Writes (name, record dictionary) pairs to filename atomically, in the format of address_book.json.
+    The content goes to a temporary file first (tmp_name, <filename>.tmp by default), which is flushed to disk
+    and then renamed over the target, so a crash in the middle of the write leaves either the old or the new file,
+    never a mix of both.
+    """
+    tmp_name = tmp_name or f"{filename}.tmp"
+    write_book_file(tmp_name, records_data)
+    os.replace(tmp_name, filename)
+    fsync_directory(os.path.dirname(filename))
+
+
+# Writes a book to a file and flushes it to disk
+def write_book_file(filename, records_data):
+    with open(filename, "w", encoding="utf-8") as file:
+        write_book(records_data, file.write)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+# File name suffixes of address books kept in a SQLite database
+SQLITE_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def open_storage(filename):
+    """
+    Returns the storage backend for an address book file: a SQLite database for the SQLITE_SUFFIXES,
+    a JSON snapshot with a journal for anything else.
+
+    Every backend provides load(), append(changes), write_snapshot(records_data) and close().
+    A queryable backend keeps the records itself instead of loading them into memory:
+    it provides records(materialize), a mapping that replaces AddressBook.data and answers the queries of the book.
+    """
+    if filename.lower().endswith(SQLITE_SUFFIXES):
+        from sqlite_storage import SQLiteStorage  # sqlite3 is only imported when it is used
+        return SQLiteStorage(filename)
+    return JournalStorage(filename)
+
+
+class JournalStorage:
+    """
+    Journaled storage backend for the address book.
+
+    The book lives in two files:
+        <filename>           - a snapshot in the regular address_book.json format;
+        <filename>.journal   - an append-only log of record-level mutations made after the snapshot.
+
+    Every save appends one line per changed record ({"op": "put", ...} or {"op": "delete", ...}),
+    so its cost depends on the size of the change and not on the size of the book.
+    Once the journal grows past compact_every entries it is rotated to <filename>.journal.old
+    and merged into a new snapshot by a background thread. An error of the compaction is raised
+    by the next append() or wait(), and the compaction is tried again with the next rotation.
+    All operations are idempotent, so replaying a journal twice after a crash gives the same book.
+    """
+    queryable = False
+
+    def __init__(self, filename, compact_every=1000):
+        self.filename = filename
+        self.journal_name = f"{filename}.journal"
+        self.rotated_name = f"{filename}.journal.old"
+        self.compacted_name = f"{filename}.compact.tmp"
+        self.compact_every = compact_every
+        self.entries = 0
+        self._lock = threading.Lock()
+        self._compactor = None
+        self._compaction_error = None
+
+    # Restore the book: yields (name, record_dict) pairs of the snapshot with the rotated
+    # and the current journal applied on top of it. The snapshot is parsed incrementally.
+    def load(self):
+        journal_data = {}
+        self._replay(self.rotated_name, journal_data, deletions=True)
+        self.entries = self._replay(self.journal_name, journal_data, repair=True, deletions=True)
+
+        try:
+            with open(self.filename, "rb") as file:
+                for name, record_data in iter_book(file):
+                    if name in journal_data:
+                        record_data = journal_data.pop(name)
+                    if record_data is not None:
+                        yield name, record_data
+        except FileNotFoundError:
+            pass
+
+        for name, record_data in journal_data.items():
+            if record_data is not None:
+                yield name, record_data
+
+        # A compaction was interrupted by a crash, finish it
+        if os.path.exists(self.rotated_name):
+            self._start_compaction()
+
+    # Append record-level changes: an iterable of (name, record_dict) pairs, record_dict is None for deletions
+    def append(self, changes):
+        lines = []
+        for name, record_data in changes:
+            if record_data is None:
+                entry = {"op": "delete", "name": name}
+            else:
+                entry = {"op": "put", "name": name, "record": record_data}
+            lines.append(json.dumps(entry) + "\n")
+
+        self._raise_compaction_error()
+        if not lines:
+            return
+
+        with self._lock:
+            with open(self.journal_name, "a", encoding="utf-8") as file:
+                file.writelines(lines)
+                file.flush()
+                os.fsync(file.fileno())
+            self.entries += len(lines)
+
+            if self.entries >= self.compact_every:
+                self._rotate()
+
+    # Replace the whole book with a fresh snapshot of (name, record_dict) pairs and drop the journals
+    def write_snapshot(self, records_data):
+        while True:
+            self.wait()
+            with self._lock:
+                # An append may have started a compaction after the wait, it would replace this snapshot
+                if self._compactor is not None and self._compactor.is_alive():
+                    continue
+                atomic_write_book(self.filename, records_data)
+                for name in (self.journal_name, self.rotated_name):
+                    try:
+                        os.remove(name)
+                    except FileNotFoundError:
+                        pass
+                self.entries = 0
+                return
+
+    # Merge the journal into the snapshot without waiting for the threshold
+    def compact(self, wait=False):
+        with self._lock:
+            if self.entries:
+                self._rotate()
+        if wait:
+            self.wait()
+
+    # Wait for a running background compaction, raises its error
+    def wait(self):
+        compactor = self._compactor
+        if compactor is not None:
+            compactor.join()
+        self._raise_compaction_error()
+
+    def _raise_compaction_error(self):
+        error, self._compaction_error = self._compaction_error, None
+        if error is not None:
+            raise error
+
+    def close(self):
+        self.wait()
+
+    def _rotate(self):
+        # The previous compaction is still running (or has failed), its journal is not merged yet
+        if os.path.exists(self.rotated_name):
+            self._start_compaction()
+            return
+        os.replace(self.journal_name, self.rotated_name)
+        self.entries = 0
+        self._start_compaction()
+
+    def _start_compaction(self):
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self._compact_rotated, name="journal-compaction", daemon=True)
+        self._compactor.start()
+
+    def _compact_rotated(self):
+        try:
+            records_data = self._read_snapshot()
+            self._replay(self.rotated_name, records_data)
+            write_book_file(self.compacted_name, records_data.items())
+            # write_snapshot does not run while the compactor is alive, only the appends are kept out
+            with self._lock:
+                os.replace(self.compacted_name, self.filename)
+                fsync_directory(os.path.dirname(self.filename))
+                os.remove(self.rotated_name)
+        except Exception as error:
+            self._compaction_error = error
+
+    def _read_snapshot(self):
+        try:
+            with open(self.filename, "rb") as file:
+                return load_book(file)
+        except FileNotFoundError:
+            return {}
+
+    # Applies a journal to records_data. With deletions=True deleted records are kept as None.
+    def _replay(self, journal_name, records_data, repair=False, deletions=False):
+        try:
+            with open(journal_name, "rb") as file:
+                content = file.read()
+        except FileNotFoundError:
+            return 0
+
+        # A crash during an append may leave a torn last line: ignore it and cut it off,
+        # otherwise the next append would be glued to it
+        good_size = content.rfind(b"\n") + 1
+        if repair and good_size < len(content):
+            with open(journal_name, "r+b") as file:
+                file.truncate(good_size)
+
+        entries = 0
+        for line in content[:good_size].splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry["op"] == "put":
+                records_data[entry["name"]] = entry["record"]
+            elif entry["op"] == "delete":
+                if deletions:
+                    records_data[entry["name"]] = None
+                else:
+                    records_data.pop(entry["name"], None)
+            entries += 1
+
+        return entries